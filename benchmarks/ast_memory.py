@@ -0,0 +1,45 @@
+import argparse
+import collections
+import gc
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.parse_scaling import make_source  # noqa: E402
+from compiler.driver import parse_program  # noqa: E402
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Memory retained per AST node after parsing.')
+    arg_parser.add_argument('sizes', nargs='*', type=int, default=[10000, 100000], help='number of statements')
+    args = arg_parser.parse_args()
+
+    print('{0:>10} {1:>10} {2:>12} {3:>12} {4:>10}'.format('statements', 'nodes', 'retained MB', 'peak MB',
+                                                           'bytes/node'))
+    for size in args.sizes:
+        source = make_source(size)
+        gc.collect()
+        tracemalloc.start()
+        program = parse_program([source], fold=False)
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        counts = collections.Counter(type(node).__name__ for node in program.walk())
+        nodes = sum(counts.values())
+        print('{0:>10} {1:>10} {2:>12.1f} {3:>12.1f} {4:>10.1f}'.format(
+            size, nodes, retained / 1024.0 / 1024.0, peak / 1024.0 / 1024.0, retained / float(nodes)))
+
+    print()
+    print('{0:>18} {1:>10}'.format('node', 'shallow B'))
+    for name, _ in counts.most_common():
+        node = next(node for node in program.walk() if type(node).__name__ == name)
+        size = sys.getsizeof(node) + (sys.getsizeof(node.__dict__) if hasattr(node, '__dict__') else 0)
+        print('{0:>18} {1:>10}'.format(name, size))
+
+
+if __name__ == '__main__':
+    main()
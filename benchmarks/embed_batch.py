@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from compiler.embed import Library  # noqa: E402
+
+SOURCE = """
+int score(x, y) {
+    for (i := 0; i < 3; 1) {
+        x := x * 3 + y / 7;
+    }
+    return x - y;
+}
+"""
+
+
+def score_numpy(x, y):
+    for _ in range(3):
+        x = x * 3 + y // 7
+    return x - y
+
+
+def measure(function, rows):
+    start = time.perf_counter()
+    function()
+    return rows / (time.perf_counter() - start)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Rows/sec of a .gg function called per row and in batches.')
+    arg_parser.add_argument('-n', '--rows', type=int, default=10000000)
+    arg_parser.add_argument('--per-call-rows', type=int, default=200000, help='rows for the per-row call loop')
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    lib = Library(SOURCE)
+    compile_time = time.perf_counter() - start
+    x = numpy.arange(args.rows, dtype=numpy.int64)
+    y = numpy.full(args.rows, 700, dtype=numpy.int64)
+    out = numpy.empty(args.rows, dtype=numpy.int64)
+    rows = args.per_call_rows
+    xs, ys = x[:rows].tolist(), y[:rows].tolist()
+
+    results = [
+        ('per-row call', measure(lambda: [lib.score(a, b) for a, b in zip(xs, ys)], rows)),
+        ('batch', measure(lambda: lib.score.batch(x, y, out=out), args.rows)),
+        ('batch strided', measure(lambda: lib.score.batch(x[::2], y[::2], out=out[:args.rows // 2]),
+                                  args.rows // 2)),
+        ('batch scalar y', measure(lambda: lib.score.batch(x, 700, out=out), args.rows)),
+        ('numpy', measure(lambda: score_numpy(x, y), args.rows)),
+    ]
+    assert (lib.score.batch(x[:rows], y[:rows]) == score_numpy(x[:rows], y[:rows])).all()
+
+    print('compiled in {0:.1f} ms'.format(compile_time * 1000))
+    print('{0:>16} {1:>14}'.format('mode', 'rows/sec'))
+    for name, rate in results:
+        print('{0:>16} {1:>14.0f}'.format(name, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import ProgramGenerator, add_shape_arguments, shape_options  # noqa: E402
+
+# Metric to the phase of compiler/stats.py it comes from
+PHASE_METRICS = {
+    'parse_seconds': 'parse',
+    'generate_seconds': 'generate',
+    'optimize_seconds': 'optimize',
+    'jit_seconds': 'finalize_object',
+    'run_seconds': 'run',
+}
+# Metrics where more is better, every other one is a regression when it grows
+HIGHER_IS_BETTER = ('lex_tokens_per_sec',)
+
+
+def run_child(root, path, opt, output):
+    # One fresh process per measurement, so the peak RSS and LLVM state belong to this program alone
+    sys.path.insert(0, root)
+    from compiler.driver import main as driver_main
+    from compiler.lexer import Lexer
+
+    with open(path) as f:
+        source = f.read()
+    lexer = Lexer().get_lexer()
+    start = time.perf_counter()
+    tokens = sum(1 for _ in lexer.lex(source))
+    lex_seconds = time.perf_counter() - start
+
+    stats_file = output + '.stats'
+    status = driver_main([path, '--run', '--no-cache', '-O', opt, '--stats', 'json', '--stats-file', stats_file])
+    with open(stats_file) as f:
+        report = json.load(f)
+    os.unlink(stats_file)
+
+    phases = dict((phase['name'], phase['seconds']) for phase in report['phases'])
+    result = dict((metric, phases.get(phase, 0.0)) for metric, phase in PHASE_METRICS.items())
+    result.update({
+        'status': status,
+        'tokens': tokens,
+        'lex_tokens_per_sec': tokens / lex_seconds,
+        'total_seconds': report['total_seconds'],
+        'peak_rss': report['peak_rss'],
+        'ir_instructions': report['counts'].get('ir_instructions'),
+        'optimized_ir_instructions': report['counts'].get('optimized_ir_instructions'),
+    })
+    with open(output, 'w') as f:
+        json.dump(result, f)
+
+
+def measure(root, path, opt, samples):
+    # Best of the samples for every metric, the least disturbed by other load on the machine
+    best = None
+    for _ in range(samples):
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            output = f.name
+        try:
+            subprocess.check_call([sys.executable, os.path.abspath(__file__), 'child', root, path, opt, output],
+                                  stdout=subprocess.DEVNULL)
+            with open(output) as f:
+                result = json.load(f)
+        finally:
+            os.unlink(output)
+        if best is None:
+            best = result
+            continue
+        for metric, value in result.items():
+            if isinstance(value, (int, float)) and best.get(metric) is not None:
+                best[metric] = max(best[metric], value) if metric in HIGHER_IS_BETTER else min(best[metric], value)
+    return best
+
+
+def git_revision(root):
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=root,
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    root = os.path.abspath(args.root)
+    options = shape_options(args)
+    results = []
+    tmp_dir = tempfile.mkdtemp()
+    print('{0:>9} {1:>3} {2:>12} {3:>9} {4:>9} {5:>9} {6:>9} {7:>9} {8:>9}'.format(
+        'functions', '-O', 'tokens/sec', 'parse ms', 'gen ms', 'opt ms', 'jit ms', 'run ms', 'MiB'))
+    for functions in args.sizes:
+        path = os.path.join(tmp_dir, 'f{0}.gg'.format(functions))
+        with open(path, 'w') as f:
+            f.write(ProgramGenerator(**dict(options, functions=functions)).generate())
+        for opt in args.opt:
+            result = dict(measure(root, path, opt, args.samples), functions=functions, opt=opt)
+            results.append(result)
+            print('{0:>9} {1:>3} {2:>12.0f} {3:>9.1f} {4:>9.1f} {5:>9.1f} {6:>9.1f} {7:>9.1f} {8:>9.1f}'.format(
+                functions, opt, result['lex_tokens_per_sec'], result['parse_seconds'] * 1000,
+                result['generate_seconds'] * 1000, result['optimize_seconds'] * 1000,
+                result['jit_seconds'] * 1000, result['run_seconds'] * 1000, result['peak_rss'] / 2 ** 20))
+            sys.stdout.flush()
+        os.unlink(path)
+    os.rmdir(tmp_dir)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'revision': git_revision(root),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'shape': options,
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print('wrote {0}'.format(args.output))
+
+
+def compare(args):
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if old['shape'] != new['shape']:
+        print('warning: the programs were generated with different shapes')
+    old_results = dict(((result['functions'], result['opt']), result) for result in old['results'])
+
+    regressions = 0
+    print('{0:>9} {1:>3} {2:<26} {3:>14} {4:>14} {5:>8}'.format('functions', '-O', 'metric', 'old', 'new', 'change'))
+    for result in new['results']:
+        before = old_results.get((result['functions'], result['opt']))
+        if before is None:
+            continue
+        for metric in sorted(result):
+            value, old_value = result[metric], before.get(metric)
+            if metric in ('functions', 'opt', 'status') or not isinstance(value, (int, float)) or not old_value:
+                continue
+            # Differences between tiny timings are noise
+            if metric.endswith('_seconds') and max(value, old_value) < args.min_seconds:
+                continue
+            change = value / old_value - 1
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = ''
+            if worse > args.threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            if flag or args.verbose:
+                print('{0:>9} {1:>3} {2:<26} {3:>14.6g} {4:>14.6g} {5:>+7.1%}{6}'.format(
+                    result['functions'], result['opt'], metric, old_value, value, change, flag))
+    print('{0} regressions between {1} and {2}'.format(regressions, old.get('revision'), new.get('revision')))
+    return 1 if regressions else 0
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='End to end compile and run time of synthetic programs.')
+    commands = arg_parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run_parser = commands.add_parser('run', help='measure and write the results as JSON')
+    run_parser.add_argument('-o', dest='output', default='end_to_end.json', help='results file')
+    run_parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 500], help='function counts')
+    run_parser.add_argument('-O', dest='opt', nargs='+', default=['0', '2', '3'], help='optimization levels')
+    run_parser.add_argument('--samples', type=int, default=3, help='runs per measurement, the best one counts')
+    run_parser.add_argument('--root', default=ROOT,
+                            help='checkout of the compiler to measure, e.g. a git worktree of another commit')
+    add_shape_arguments(run_parser)
+
+    compare_parser = commands.add_parser('compare', help='flag regressions between two results files')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='relative change that is a regression')
+    compare_parser.add_argument('--min-seconds', type=float, default=0.005,
+                                help='ignore timings where both sides are below this')
+    compare_parser.add_argument('-v', '--verbose', action='store_true', help='print every metric')
+
+    child_parser = commands.add_parser('child')
+    for name in ('root', 'path', 'opt', 'output'):
+        child_parser.add_argument(name)
+
+    args = arg_parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'compare':
+        return compare(args)
+    else:
+        run_child(args.root, args.path, args.opt, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
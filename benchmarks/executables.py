@@ -0,0 +1,17 @@
+import os
+import subprocess
+import time
+
+
+def run_executable(path, runs=1, capture=True, check=True):
+    # Best wall time of runs runs of a compiled program and the last run's process, with its output unless capture
+    # is off: reading a large output back through a pipe would be timed along with the program
+    best = None
+    process = None
+    for _ in range(runs):
+        with open(os.devnull, 'wb') as devnull:
+            start = time.perf_counter()
+            process = subprocess.run([path], stdout=subprocess.PIPE if capture else devnull, check=check)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, process
@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import time
+
+from rply import LexerGenerator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from compiler.lexer import Lexer  # noqa: E402
+
+
+def build_rply_lexer():
+    # The rule-by-rule rply lexer this repository used before CombinedLexer
+    lg = LexerGenerator()
+    for name, pattern in [
+        ('PRINT', r'print'), ('INPUT', r'input'), ('OPEN_PAREN', r'\('), ('CLOSE_PAREN', r'\)'),
+        ('SEMICOLON', r';'), ('SUM', r'\+'), ('SUB', r'\-'), ('NUMBER', r'\d+'), ('MUL', r'\*'),
+        ('DIV', r'/'), ('NOT', r'!'), ('COMPLEMENT', r'~'), ('PRIMITIVE_DATA_TYPE', r'int'),
+        ('OPEN_CURLY', r'{'), ('CLOSE_CURLY', r'}'), ('RETURN', r'return'), ('IF', r'if'),
+        ('ELSE', r'else'), ('EQUALS', r'=='), ('NOT_EQUALS', r'!='), ('FOR', r'for'), ('LESS_EQ', r'<='),
+        ('GREATER_EQ', r'>='), ('LESS', r'<'), ('GREATER', r'>'), ('EQUAL_SIGN', r':='), ('COMMA', r','),
+        ('IDENTIFIER', r'[a-zA-Z]\w*'),
+    ]:
+        lg.add(name, pattern)
+    lg.ignore(r'\s+')
+    return lg.build()
+
+
+def make_source(size_mb):
+    with open(os.path.join(ROOT, 'example.gg')) as f:
+        chunk = f.read() + '\n'
+    return chunk * max(1, int(size_mb * 1024 * 1024 / len(chunk)))
+
+
+def measure(lexer, source):
+    start = time.perf_counter()
+    tokens = [(t.gettokentype(), t.getstr()) for t in lexer.lex(source)]
+    return tokens, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Lexer throughput, combined pattern vs. rply.')
+    arg_parser.add_argument('sizes', nargs='*', type=float, default=[1, 4], help='input sizes in MB')
+    args = arg_parser.parse_args()
+
+    print('{0:>8} {1:>10} {2:>14} {3:>14} {4:>8}'.format('MB', 'tokens', 'rply tok/s', 'combined tok/s', 'speedup'))
+    for size in args.sizes:
+        source = make_source(size)
+        old_tokens, old_time = measure(build_rply_lexer(), source)
+        new_tokens, new_time = measure(Lexer().get_lexer(), source)
+        if old_tokens != new_tokens:
+            raise SystemExit('Token streams differ')
+        print('{0:>8.1f} {1:>10} {2:>14.0f} {3:>14.0f} {4:>7.1f}x'.format(
+            len(source) / 1024.0 / 1024.0, len(new_tokens), len(new_tokens) / old_time,
+            len(new_tokens) / new_time, old_time / new_time))
+
+
+if __name__ == '__main__':
+    main()
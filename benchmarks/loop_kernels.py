@@ -0,0 +1,137 @@
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.executables import run_executable  # noqa: E402
+from compiler.driver import EXE_SUFFIX, OPT_LEVELS, compile_sources, link_objects  # noqa: E402
+
+# Function calls are statements and only arguments and loop counters are variables, so every kernel is one
+# function whose extra arguments serve as locals; main passes n and zeros for them
+KERNELS = {
+    # Counted loop with a reduction, a candidate for the loop vectorizer
+    'sum_squares': """
+int kernel(n, acc) {
+    for (i := 0; i < n; 1) {
+        acc := acc + (i - i / 8 * 8) * (i - i / 8 * 8);
+    }
+    print(acc);
+    return 0;
+}
+""",
+    # Inner trip count depends on the outer counter, has a closed form
+    'triangle': """
+int kernel(n, acc) {
+    n := n / 1000;
+    for (i := 0; i < n; 1) {
+        for (j := 0; j < i; 1) {
+            acc := acc + j;
+        }
+    }
+    print(acc);
+    return 0;
+}
+""",
+    # Data dependent branches in the body
+    'collatz': """
+int kernel(n, acc, x) {
+    n := n / 100;
+    for (i := 1; i < n; 1) {
+        x := i;
+        for (s := 0; x != 1; 1) {
+            if (x / 2 * 2 == x) {
+                x := x / 2;
+            } else {
+                x := 3 * x + 1;
+            }
+            acc := acc + 1;
+        }
+    }
+    print(acc);
+    return 0;
+}
+""",
+    # Inner loops that usually run zero times, the initial check decides
+    'zero_trip': """
+int kernel(n, acc) {
+    for (i := 0; i < n; 1) {
+        for (j := 0; j < i - n + 3; 1) {
+            acc := acc + j + 1;
+        }
+    }
+    print(acc);
+    return 0;
+}
+""",
+    # Trial division with a flag instead of break
+    'primes': """
+int kernel(n, acc, prime) {
+    n := n / 100;
+    for (i := 2; i < n; 1) {
+        prime := 1;
+        for (d := 2; d * d <= i; 1) {
+            if (i / d * d == i) {
+                prime := 0;
+            } else {
+                prime := prime;
+            }
+        }
+        acc := acc + prime;
+    }
+    print(acc);
+    return 0;
+}
+""",
+}
+
+MAIN = """
+int main() {{
+    kernel({0});
+    return 0;
+}}
+"""
+
+
+def kernel_source(name, n):
+    source = KERNELS[name]
+    args = re.search(r'kernel\(([^)]*)\)', source).group(1).split(',')
+    return source + MAIN.format(', '.join([str(n)] + ['0'] * (len(args) - 1)))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Compile and run time of loop-heavy .gg kernels.')
+    arg_parser.add_argument('kernels', nargs='*', metavar='kernel',
+                            help='kernels to run, any of {0} (default: all)'.format(', '.join(sorted(KERNELS))))
+    arg_parser.add_argument('-n', type=int, default=100000000, help='problem size, scaled down by some kernels')
+    arg_parser.add_argument('-O', dest='opt', choices=sorted(OPT_LEVELS), default='2')
+    arg_parser.add_argument('-r', '--runs', type=int, default=3)
+    args = arg_parser.parse_args()
+    unknown = set(args.kernels) - set(KERNELS)
+    if unknown:
+        arg_parser.error('unknown kernels: {0}'.format(', '.join(sorted(unknown))))
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print('{0:>12} {1:>12} {2:>10} {3:>20}'.format('kernel', 'compile ms', 'run s', 'result'))
+        for name in args.kernels or sorted(KERNELS):
+            start = time.perf_counter()
+            cg = compile_sources([kernel_source(name, args.n)], args.opt)
+            obj = cg.emit('obj')
+            compile_time = time.perf_counter() - start
+            exe = os.path.join(tmp_dir, name + EXE_SUFFIX)
+            link_objects([obj], exe)
+            elapsed, process = run_executable(exe, args.runs)
+            output = process.stdout.decode('utf-8').strip()
+            print('{0:>12} {1:>12.1f} {2:>10.3f} {3:>20}'.format(name, compile_time * 1000, elapsed, output))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
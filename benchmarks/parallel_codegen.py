@@ -0,0 +1,46 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.parse_scaling import make_source  # noqa: E402
+from compiler.codegen import CodeGen  # noqa: E402
+from compiler.driver import parse_program  # noqa: E402
+from compiler.generator import IRGenerator  # noqa: E402
+from compiler.split import ParallelCompiler  # noqa: E402
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Split-module optimization and codegen time from 1 to N jobs.')
+    arg_parser.add_argument('--functions', type=int, default=2000)
+    arg_parser.add_argument('--per-function', type=int, default=20, help='statements per function')
+    arg_parser.add_argument('--max-jobs', type=int, default=multiprocessing.cpu_count())
+    arg_parser.add_argument('-O', dest='opt', type=int, default=2)
+    args = arg_parser.parse_args()
+
+    source = make_source(args.functions * args.per_function, args.per_function)
+    cg = CodeGen(args.opt)
+    program = parse_program([source])
+
+    start = time.perf_counter()
+    IRGenerator(cg).generate(program)
+    cg.compile_object(str(cg.module))
+    single = time.perf_counter() - start
+    print('{0:>12} {1:>10} {2:>8}'.format('jobs', 'seconds', 'speedup'))
+    print('{0:>12} {1:>10.2f} {2:>7.2f}x'.format('one module', single, 1.0))
+
+    jobs = 1
+    while jobs <= args.max_jobs:
+        start = time.perf_counter()
+        ParallelCompiler(cg, jobs).build(program)
+        elapsed = time.perf_counter() - start
+        print('{0:>12} {1:>10.2f} {2:>7.2f}x'.format(jobs, elapsed, single / elapsed))
+        jobs = jobs * 2 if jobs * 2 <= args.max_jobs or jobs == args.max_jobs else args.max_jobs
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_source(statements, per_function=1000):
+    # Functions of per_function statements each, so both the body and the program lists grow
+    lines = []
+    per_function = max(1, min(per_function, statements))
+    functions = statements // per_function
+    for i in range(functions):
+        lines.append('int f{0}(a, b, c) {{'.format(i))
+        for j in range(per_function - 1):
+            lines.append('    a := a + b * {0} - c;'.format(j))
+        lines.append('    f{0}(a, b, c);'.format(max(0, i - 1)))
+        lines.append('    return a;')
+        lines.append('}')
+    lines.append('int main() {')
+    lines.append('    print(1);')
+    lines.append('    return 0;')
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def run_child(statements, per_function):
+    from compiler.lexer import Lexer
+    from compiler.parser import Parser, ParserState
+
+    source = make_source(statements, per_function)
+    lexer = Lexer().get_lexer()
+    pg = Parser()
+    pg.parse()
+    parser = pg.get_parser()
+
+    start = time.perf_counter()
+    program = parser.parse(lexer.lex(source), state=ParserState())
+    elapsed = time.perf_counter() - start
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(len(program.functions), elapsed, rss_kb)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Lex + parse time and peak memory as the program grows.')
+    arg_parser.add_argument('sizes', nargs='*', type=int, default=[1000, 10000, 100000, 1000000],
+                            help='number of statements')
+    arg_parser.add_argument('--per-function', type=int, default=1000, help='statements per function')
+    arg_parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.child, args.per_function)
+        return
+
+    print('{0:>10} {1:>10} {2:>10} {3:>12} {4:>12}'.format('statements', 'functions', 'seconds', 'us/stmt',
+                                                            'peak RSS MB'))
+    for size in args.sizes:
+        out = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--child', str(size),
+                                       '--per-function', str(args.per_function)], cwd=ROOT)
+        functions, elapsed, rss_kb = out.decode().split()
+        elapsed = float(elapsed)
+        print('{0:>10} {1:>10} {2:>10.2f} {3:>12.2f} {4:>12.1f}'.format(
+            size, functions, elapsed, elapsed / size * 1e6, int(rss_kb) / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from compiler.driver import EXE_SUFFIX, OPT_LEVELS, compile_sources, link_objects  # noqa: E402
+from compiler.profile import Profile  # noqa: E402
+from loop_kernels import KERNELS, kernel_source, run_executable  # noqa: E402
+
+# A hot step function with a rarely taken branch into a large cold path, the shape of a batch job's main loop
+DISPATCH = """
+int step(i, acc) {
+    if (i / 4096 * 4096 == i) {
+        acc := acc * 31 + i / 7 - acc / 13;
+        acc := acc * 17 + i / 5 - acc / 11;
+        acc := acc * 13 + i / 3 - acc / 7;
+        acc := acc * 11 + i / 9 - acc / 5;
+        print(acc);
+    } else {
+        acc := acc + i / 3;
+    }
+    return acc;
+}
+
+int kernel(n, acc) {
+    for (i := 0; i < n; 1) {
+        acc := acc + i / 3;
+        if (i / 4096 * 4096 == i) {
+            step(i, acc);
+        } else {
+            acc := acc - i / 5;
+        }
+    }
+    print(acc);
+    return 0;
+}
+"""
+
+
+def build(source, opt, exe, **options):
+    start = time.perf_counter()
+    cg = compile_sources([source], opt, **options)
+    obj = cg.emit('obj')
+    compile_time = time.perf_counter() - start
+    link_objects([obj], exe)
+    return compile_time
+
+
+def main():
+    KERNELS.setdefault('dispatch', DISPATCH)
+    arg_parser = argparse.ArgumentParser(description='Run time of kernels with and without profile guided optimization.')
+    arg_parser.add_argument('kernels', nargs='*', metavar='kernel',
+                            help='kernels to run, any of {0} (default: all)'.format(', '.join(sorted(KERNELS))))
+    arg_parser.add_argument('-n', type=int, default=100000000, help='problem size, scaled down by some kernels')
+    arg_parser.add_argument('--train', type=int, default=10, help='the training run uses n divided by this')
+    arg_parser.add_argument('-O', dest='opt', choices=sorted(OPT_LEVELS), default='2')
+    arg_parser.add_argument('-r', '--runs', type=int, default=3)
+    args = arg_parser.parse_args()
+    unknown = set(args.kernels) - set(KERNELS)
+    if unknown:
+        arg_parser.error('unknown kernels: {0}'.format(', '.join(sorted(unknown))))
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print('{0:>12} {1:>10} {2:>10} {3:>10} {4:>8}'.format('kernel', 'train s', 'base s', 'pgo s', 'speedup'))
+        for name in args.kernels or sorted(KERNELS):
+            source = kernel_source(name, args.n)
+            exe = os.path.join(tmp_dir, name + EXE_SUFFIX)
+            profile = os.path.join(tmp_dir, name + '.ggprof')
+
+            build(kernel_source(name, args.n // args.train), args.opt, exe, profile_generate=profile)
+            train_time, _ = run_executable(exe, 1)
+            build(source, args.opt, exe)
+            base_time, base_output = run_executable(exe, args.runs)
+            build(source, args.opt, exe, profile=Profile.load(profile))
+            pgo_time, pgo_output = run_executable(exe, args.runs)
+            if pgo_output != base_output:
+                raise RuntimeError('{0}: output differs with the profile'.format(name))
+            print('{0:>12} {1:>10.3f} {2:>10.3f} {3:>10.3f} {4:>7.2f}x'.format(
+                name, train_time, base_time, pgo_time, base_time / pgo_time))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.executables import run_executable  # noqa: E402
+from compiler.driver import EXE_SUFFIX, compile_sources, link_objects  # noqa: E402
+
+PROGRAM = """
+int main() {{
+    for (i := 0; i < {0}; 1) {{
+        print(i * 7919 - 5000000);
+    }}
+    return 0;
+}}
+"""
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Printing N integers with printf vs. the buffered runtime.')
+    arg_parser.add_argument('-n', '--count', type=int, default=10000000)
+    arg_parser.add_argument('-r', '--runs', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        results = []
+        for name, buffered_io in [('printf', False), ('buffered', True)]:
+            cg = compile_sources([PROGRAM.format(args.count)], buffered_io=buffered_io)
+            exe = os.path.join(tmp_dir, name + EXE_SUFFIX)
+            link_objects([cg.emit('obj')], exe)
+            results.append((name, run_executable(exe, args.runs, capture=False)[0]))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print('{0:>10} {1:>10} {2:>14} {3:>8}'.format('runtime', 'seconds', 'ints/sec', 'speedup'))
+    for name, elapsed in results:
+        print('{0:>10} {1:>10.3f} {2:>14.0f} {3:>7.2f}x'.format(
+            name, elapsed, args.count / elapsed, results[0][1] / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import ProgramGenerator, add_shape_arguments, shape_options  # noqa: E402
+
+COUNTS = re.compile(r'compiled (\d+), reused (\d+) files')
+
+
+def write_project(directory, source, files):
+    # The generated functions dealt out round robin, so most calls cross files; main gets a file of its own
+    chunks = source.strip().split('\n\n')
+    functions, main = chunks[:-1], chunks[-1]
+    paths = []
+    for i in range(files):
+        paths.append(os.path.join(directory, 'm{0:04}.gg'.format(i)))
+        with open(paths[-1], 'w') as f:
+            f.write('\n\n'.join(functions[i::files]) + '\n')
+    with open(os.path.join(directory, 'main.gg'), 'w') as f:
+        f.write(main + '\n')
+    return paths
+
+
+def gg(args):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-m', 'compiler.driver'] + args, cwd=ROOT, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    match = COUNTS.search(result.stderr)
+    return time.perf_counter() - start, match and int(match.group(1))
+
+
+def edit(path, old, new):
+    with open(path) as f:
+        source = f.read()
+    with open(path, 'w') as f:
+        f.write(source.replace(old, new, 1))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Clean and incremental builds of a multi-file project.')
+    arg_parser.add_argument('--files', type=int, default=200, help='number of files besides main.gg')
+    arg_parser.add_argument('-O', dest='opt', default='2')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes')
+    add_shape_arguments(arg_parser)
+    arg_parser.set_defaults(functions=1000, statements=4, loop_nesting=1)
+    args = arg_parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        project = os.path.join(tmp_dir, 'project')
+        os.mkdir(project)
+        source = ProgramGenerator(**shape_options(args)).generate()
+        paths = write_project(project, source, args.files)
+        whole = os.path.join(tmp_dir, 'whole.gg')
+        with open(whole, 'w') as f:
+            f.write(source)
+        output = os.path.join(tmp_dir, 'a.out')
+        options = ['-O', args.opt, '-o', output]
+        project_options = [project, '--project', '-j', str(args.jobs), '--cache-dir', os.path.join(tmp_dir, 'cache')]
+
+        print('{0} functions in {1} files, -O{2}, {3} jobs'.format(args.functions, args.files + 1, args.opt, args.jobs))
+        print('{0:<34} {1:>10} {2:>9}'.format('build', 'seconds', 'compiled'))
+        seconds, _ = gg([whole] + options)
+        print('{0:<34} {1:>10.3f} {2:>9}'.format('single file, one module', seconds, 1))
+        seconds, _ = gg([whole, '-j', str(args.jobs)] + options)
+        print('{0:<34} {1:>10.3f} {2:>9}'.format('single file, -j', seconds, '-'))
+
+        steps = [
+            ('clean', lambda: None),
+            ('no-op', lambda: None),
+            ('touch one file', lambda: os.utime(paths[0])),
+            # A different body behind the same interface only rebuilds the file itself
+            ('change a body', lambda: edit(paths[0], 'return 0;', 'a := a + 1;\n    return 0;')),
+            # A function that no longer returns a constant changes what its callers compile to
+            ('change an interface', lambda: edit(paths[0], 'return 0;', 'return a;')),
+        ]
+        for name, step in steps:
+            step()
+            seconds, compiled = gg(project_options + options)
+            print('{0:<34} {1:>10.3f} {2:>9}'.format('project, ' + name, seconds, compiled))
+            sys.stdout.flush()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.executables import run_executable  # noqa: E402
+from compiler.driver import EXE_SUFFIX, OPT_LEVELS, compile_sources, link_objects  # noqa: E402
+
+# Calls are statements without a value, so results leave the kernels through print()
+KERNELS = {
+    # Self recursion in tail position, overflows the stack without tail calls
+    'countdown': """
+int down(n) {{
+    if (n > 0) {{
+        down(n - 1);
+    }} else {{
+        print(n);
+    }}
+    return 0;
+}}
+
+int main() {{
+    down({0});
+    return 0;
+}}
+""",
+    # Mutual recursion between functions of different arity, the callee is defined after the caller
+    'ping_pong': """
+int main() {{
+    ping({0}, 0);
+    return 0;
+}}
+
+int ping(n, acc) {{
+    if (n == 0) {{
+        print(acc);
+    }} else {{
+        pong(n - 1, acc + 1, 0);
+    }}
+    return 0;
+}}
+
+int pong(n, acc, unused) {{
+    if (n == 0) {{
+        print(acc);
+    }} else {{
+        ping(n - 1, acc + 1);
+    }}
+    return 0;
+}}
+""",
+    # The same recursion through the returned value, `return f(x);` and calls ending the branches of a returned if
+    'return_countdown': """
+int down(n, acc) {{
+    n;
+    return if (n > 0) {{
+        down(n - 1, acc + 1);
+    }} else {{
+        print(acc);
+        acc;
+    }}
+}}
+
+int main() {{
+    down({0}, 0);
+    return 0;
+}}
+""",
+    'return_ping_pong': """
+int main() {{
+    ping({0});
+    return 0;
+}}
+
+int ping(n) {{
+    n;
+    return if (n > 0) {{
+        pong(n - 1, 1);
+    }} else {{
+        print(n);
+        n;
+    }}
+}}
+
+int pong(n, unused) {{
+    n := n - unused + 1;
+    return ping(n);
+}}
+""",
+    # Tree recursion, only the second call is a tail call; the printed ones add up to fib(n)
+    'fib': """
+int fib(n) {{
+    if (n < 2) {{
+        if (n == 1) {{
+            print(1);
+        }} else {{
+            n := 0;
+        }}
+    }} else {{
+        fib(n - 1);
+        fib(n - 2);
+    }}
+    return 0;
+}}
+
+int main() {{
+    fib({1});
+    return 0;
+}}
+""",
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Run time of recursion-heavy .gg programs.')
+    arg_parser.add_argument('-n', '--depth', type=int, default=100000000, help='recursion depth of the tail calls')
+    arg_parser.add_argument('--fib', type=int, default=30, help='argument of the tree recursive fib')
+    # -O0 shows that tail calls do not depend on the optimizer
+    arg_parser.add_argument('-O', dest='opt', nargs='+', choices=sorted(OPT_LEVELS), default=['0', '2'])
+    args = arg_parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print('{0:>16} {1:>3} {2:>10} {3:>16}'.format('kernel', '-O', 'run s', 'result'))
+        for name in sorted(KERNELS):
+            source = KERNELS[name].format(args.depth, args.fib)
+            for opt in args.opt:
+                cg = compile_sources([source], opt, buffered_io=True)
+                exe = os.path.join(tmp_dir, name + EXE_SUFFIX)
+                link_objects([cg.emit('obj')], exe)
+                # Recursion that grows the stack shows up as a crash at the default depth
+                elapsed, process = run_executable(exe, check=False)
+                if process.returncode != 0:
+                    result = 'crashed ({0})'.format(process.returncode)
+                else:
+                    result = str(sum(int(line) for line in process.stdout.split()))
+                print('{0:>16} {1:>3} {2:>10.3f} {3:>16}'.format(name, opt, elapsed, result))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from compiler.repl import Repl  # noqa: E402
+
+DEFINITION = """
+int f{0}(n, acc) {{
+    for (i := 0; i < n; 1) {{
+        acc := acc + i * {0};
+    }}
+    f{1}(n, acc);
+    return 0;
+}}
+"""
+FIRST = """
+int f0(n, acc) {
+    acc := acc + n;
+    return acc;
+}
+"""
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Latency of REPL inputs as a session grows.')
+    arg_parser.add_argument('-n', '--inputs', type=int, default=2000, help='definitions, each followed by a call')
+    arg_parser.add_argument('--window', type=int, default=200, help='inputs per row')
+    arg_parser.add_argument('-O', dest='opt', default='2')
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    repl = Repl(args.opt)
+    repl.evaluate(FIRST)
+    print('session started in {0:.1f} ms'.format((time.perf_counter() - start) * 1000))
+    print('{0:>12} {1:>14} {2:>14} {3:>14} {4:>14}'.format('inputs', 'define median', 'define max', 'call median',
+                                                          'call max'))
+    define_times, call_times = [], []
+    for i in range(1, args.inputs + 1):
+        start = time.perf_counter()
+        repl.evaluate(DEFINITION.format(i, i - 1))
+        define_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        repl.evaluate('f{0}(10, 0);'.format(i))
+        call_times.append(time.perf_counter() - start)
+        if i % args.window == 0:
+            print('{0:>12} {1:>11.2f} ms {2:>11.2f} ms {3:>11.2f} ms {4:>11.2f} ms'.format(
+                i, statistics.median(define_times) * 1000, max(define_times) * 1000,
+                statistics.median(call_times) * 1000, max(call_times) * 1000))
+            define_times, call_times = [], []
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from compiler.client import connect  # noqa: E402
+from compiler.codegen import warm_up  # noqa: E402
+from compiler.driver import compile_sources  # noqa: E402
+
+PROGRAM = """
+int f(x) {{
+    for (i := 0; i < x; 1) {{
+        print(i * {0});
+    }}
+    return 0;
+}}
+
+int main() {{
+    f({0});
+    return 0;
+}}
+"""
+
+
+def compile_all(command, files, env):
+    start = time.perf_counter()
+    for path in files:
+        subprocess.check_call(command + [path, '--emit=obj', '-o', path + '.o'], env=env)
+    return time.perf_counter() - start
+
+
+def first_object(source):
+    start = time.perf_counter()
+    compile_sources([source]).emit('obj')
+    return time.perf_counter() - start
+
+
+def codegen_setup(runs=20):
+    # What a forked request spends on its first object: with a fresh CodeGen, and with one taking over the target
+    # machines, engine and pass manager that gg serve warmed up before forking
+    source = PROGRAM.format(7)
+    first_object(source)
+    cold = min(first_object(source) for _ in range(runs))
+    warm = []
+    for _ in range(runs):
+        warm_up()
+        warm.append(first_object(source))
+    return cold, min(warm)
+
+
+def wait_for_server(path, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        sock = connect(path)
+        if sock is not None:
+            sock.close()
+            return
+        time.sleep(0.05)
+    raise RuntimeError('gg serve did not start')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Compiling many small files with and without gg serve.')
+    arg_parser.add_argument('-n', '--files', type=int, default=100)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = []
+        for i in range(args.files):
+            files.append(os.path.join(tmp_dir, 'f{0}.gg'.format(i)))
+            with open(files[-1], 'w') as f:
+                f.write(PROGRAM.format(i))
+
+        socket_path = os.path.join(tmp_dir, 'serve.sock')
+        env = dict(os.environ, GG_SOCKET=socket_path)
+        gg = [sys.executable, os.path.join(ROOT, 'gg')]
+        client = [sys.executable, os.path.join(ROOT, 'main.py')]
+
+        standalone = compile_all(gg, files, env)
+        server = subprocess.Popen(gg + ['serve'], env=env, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(socket_path)
+            served = compile_all(client, files, env)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print('{0:>12} {1:>10} {2:>12}'.format('mode', 'seconds', 'ms per file'))
+    for name, elapsed in [('gg', standalone), ('gg serve', served)]:
+        print('{0:>12} {1:>10.2f} {2:>12.1f}'.format(name, elapsed, elapsed * 1000 / args.files))
+    cold, warm = codegen_setup()
+    print('first object in a request: {0:.2f} ms with a new CodeGen, {1:.2f} ms with the warmed one'.format(
+        cold * 1000, warm * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.loop_kernels import KERNELS, kernel_source, run_executable  # noqa: E402
+from compiler.codegen import CodeGen  # noqa: E402
+from compiler.driver import EXE_SUFFIX, OPT_LEVELS, compile_sources, link_objects, parse_program  # noqa: E402
+from compiler.generator import create_generator  # noqa: E402
+
+MODES = [('alloca', False), ('ssa', True)]
+
+
+def make_source(functions, per_function):
+    # Straight-line code, branches and nested loops that all write the arguments
+    lines = []
+    for i in range(functions):
+        lines.append('int f{0}(a, b, c) {{'.format(i))
+        for j in range(per_function):
+            kind = j % 3
+            if kind == 0:
+                lines.append('    a := a + b * {0} - c;'.format(j))
+            elif kind == 1:
+                lines.append('    if (a > {0}) {{ b := b - a; }} else {{ c := c + {0}; }}'.format(j))
+            else:
+                lines.append('    for (i := 0; i < b; 1) { for (j := i; j < c; 2) { a := a + i * j; } }')
+        lines.append('    print(a + b + c);')
+        lines.append('    return 0;')
+        lines.append('}')
+    lines.append('int main() {')
+    lines.append('    f0(1, 2, 3);')
+    lines.append('    return 0;')
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def compile_times(source, opt, direct_ssa):
+    opt_level, size_level = OPT_LEVELS[opt]
+    cg = CodeGen(opt_level, size_level, direct_ssa=direct_ssa)
+    program = parse_program([source])
+
+    start = time.perf_counter()
+    create_generator(cg).generate(program)
+    llvm_ir = str(cg.module)
+    generated = time.perf_counter()
+    mod = cg._optimize_ir(llvm_ir)
+    optimized = time.perf_counter()
+    obj = cg.target_machine.emit_object(mod)
+    done = time.perf_counter()
+    return generated - start, optimized - generated, done - optimized, len(llvm_ir), len(obj)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Compile time and code quality of direct SSA against allocas.')
+    arg_parser.add_argument('--functions', type=int, default=100)
+    arg_parser.add_argument('--per-function', type=int, default=15, help='statements per function')
+    arg_parser.add_argument('--levels', nargs='*', choices=sorted(OPT_LEVELS), default=['0', '1', '2'])
+    arg_parser.add_argument('-n', type=int, default=100000000, help='problem size of the loop kernels')
+    arg_parser.add_argument('--no-kernels', action='store_true', help='only measure compile time')
+    args = arg_parser.parse_args()
+
+    source = make_source(args.functions, args.per_function)
+    print('{0:>4} {1:>7} {2:>10} {3:>10} {4:>10} {5:>10} {6:>10}'.format(
+        'opt', 'mode', 'gen ms', 'opt ms', 'emit ms', 'IR KB', 'obj KB'))
+    for opt in args.levels:
+        for mode, direct_ssa in MODES:
+            gen, optimize, emit, ir_size, obj_size = compile_times(source, opt, direct_ssa)
+            print('{0:>4} {1:>7} {2:>10.1f} {3:>10.1f} {4:>10.1f} {5:>10.1f} {6:>10.1f}'.format(
+                '-O' + opt, mode, gen * 1000, optimize * 1000, emit * 1000, ir_size / 1024, obj_size / 1024))
+    if args.no_kernels:
+        return
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print()
+        print('{0:>4} {1:>12} {2:>10} {3:>10}'.format('opt', 'kernel', 'alloca s', 'ssa s'))
+        for opt in args.levels:
+            for name in sorted(KERNELS):
+                times = []
+                for mode, direct_ssa in MODES:
+                    cg = compile_sources([kernel_source(name, args.n)], opt, direct_ssa=direct_ssa)
+                    exe = os.path.join(tmp_dir, '{0}-{1}{2}'.format(name, mode, EXE_SUFFIX))
+                    link_objects([cg.emit('obj')], exe)
+                    times.append(run_executable(exe, 1)[0])
+                print('{0:>4} {1:>12} {2:>10.3f} {3:>10.3f}'.format('-O' + opt, name, *times))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
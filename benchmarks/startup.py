@@ -0,0 +1,77 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from compiler.parser import Parser  # noqa: E402
+
+# Builds the lexer and parser in a fresh interpreter and reports how long that took
+FRONTEND_SNIPPET = """
+import time
+start = time.perf_counter()
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+Lexer().get_lexer()
+pg = Parser()
+pg.parse()
+pg.get_parser()
+print(time.perf_counter() - start)
+"""
+
+
+def table_cache_file():
+    pg = Parser()
+    pg.parse()
+    return pg.table_cache_file()
+
+
+def run_frontend():
+    out = subprocess.check_output([sys.executable, '-c', FRONTEND_SNIPPET], cwd=ROOT)
+    return float(out.decode().strip().splitlines()[-1])
+
+
+def measure(runs, cold):
+    cache_file = table_cache_file()
+    times = []
+    for _ in range(runs):
+        if cold and os.path.exists(cache_file):
+            os.remove(cache_file)
+        times.append(run_frontend())
+    return min(times), sum(times) / len(times)
+
+
+def measure_in_process(runs):
+    from compiler.lexer import Lexer
+
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        Lexer().get_lexer()
+        pg = Parser()
+        pg.parse()
+        pg.get_parser()
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Lexer/parser startup cost, cold vs. warm table cache.')
+    arg_parser.add_argument('-n', '--runs', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    results = [
+        ('cold (no table cache)', measure(args.runs, cold=True)),
+        ('warm (table cache)', measure(args.runs, cold=False)),
+        ('reused (same process)', measure_in_process(args.runs)),
+    ]
+    print('{0:<24} {1:>10} {2:>10}'.format('frontend startup', 'min ms', 'mean ms'))
+    for name, (best, mean) in results:
+        print('{0:<24} {1:>10.2f} {2:>10.2f}'.format(name, best * 1000, mean * 1000))
+
+
+if __name__ == '__main__':
+    main()
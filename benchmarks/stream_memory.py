@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import ProgramGenerator, add_shape_arguments, shape_options  # noqa: E402
+
+
+def write_program(path, options):
+    with open(path, 'w') as f:
+        for line in ProgramGenerator(**options).lines():
+            f.write(line)
+            f.write('\n')
+    return os.path.getsize(path)
+
+
+def compile_program(path, opt, stream):
+    # A fresh process per build, its peak RSS is that of the build alone
+    stats_file = path + '.stats'
+    args = [sys.executable, '-m', 'compiler.driver', path, '--emit', 'obj', '-o', path + '.o', '-O', opt,
+            '--stats', 'json', '--stats-file', stats_file] + (['--stream'] if stream else [])
+    start = time.perf_counter()
+    subprocess.check_call(args, cwd=ROOT)
+    seconds = time.perf_counter() - start
+    with open(stats_file) as f:
+        report = json.load(f)
+    os.unlink(stats_file)
+    os.unlink(path + '.o')
+    return seconds, report['peak_rss']
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Peak RSS of whole program and --stream builds by input size.')
+    arg_parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 4000, 16000], help='function counts')
+    arg_parser.add_argument('-O', dest='opt', default='0')
+    arg_parser.add_argument('--stream-only', action='store_true', help='skip the whole program builds')
+    add_shape_arguments(arg_parser)
+    arg_parser.set_defaults(statements=4, loop_nesting=1, repeat=1)
+    args = arg_parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print('{0:>9} {1:>10} {2:>12} {3:>10} {4:>12} {5:>10}'.format(
+            'functions', 'MiB', 'whole s', 'whole MiB', 'stream s', 'stream MiB'))
+        for functions in args.sizes:
+            path = os.path.join(tmp_dir, 'f{0}.gg'.format(functions))
+            size = write_program(path, dict(shape_options(args), functions=functions))
+            whole = (float('nan'), float('nan'))
+            if not args.stream_only:
+                whole = compile_program(path, args.opt, False)
+            stream = compile_program(path, args.opt, True)
+            print('{0:>9} {1:>10.1f} {2:>12.2f} {3:>10.1f} {4:>12.2f} {5:>10.1f}'.format(
+                functions, size / 2 ** 20, whole[0], whole[1] / 2 ** 20, stream[0], stream[1] / 2 ** 20))
+            sys.stdout.flush()
+            os.unlink(path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
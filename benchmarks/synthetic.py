@@ -0,0 +1,138 @@
+import argparse
+import random
+
+# Function calls are statements and only arguments and loop counters are variables, so every function takes its
+# locals as arguments; callers pass values for them
+LOCALS = ['a', 'b', 'c', 'd']
+OPERATORS = ['+', '-', '*', '/']
+# Comparisons only make up the conditions of ifs and loops
+COMPARISONS = ['<', '<=', '>', '>=', '==', '!=']
+UNARY = ['-', '~', '!']
+
+
+class ProgramGenerator(object):
+    # Valid, terminating .gg programs of a given shape. Function i only calls functions below i, once per call, so
+    # each call of main runs every function once. Prints are outside loops, divisors are constants and loops are
+    # counted, so the output and the run time stay bounded.
+    def __init__(self, functions=100, statements=10, statement_depth=2, expression_depth=3, loop_nesting=2,
+                 prints=100, trip_count=8, repeat=100, seed=0):
+        self.functions = max(1, functions)
+        self.statements = max(1, statements)
+        self.statement_depth = statement_depth
+        self.expression_depth = expression_depth
+        self.loop_nesting = loop_nesting
+        self.prints = prints
+        self.trip_count = trip_count
+        self.repeat = repeat
+        self.random = random.Random(seed)
+
+    def expression(self, depth, names):
+        if depth <= 0 or self.random.random() < 0.2:
+            if self.random.random() < 0.3:
+                return str(self.random.randint(0, 99))
+            return self.random.choice(names)
+        if self.random.random() < 0.15:
+            return '{0}({1})'.format(self.random.choice(UNARY), self.expression(depth - 1, names))
+        operator = self.random.choice(OPERATORS)
+        if operator == '/':
+            # Never divides by zero and never overflows
+            return '({0} / {1})'.format(self.expression(depth - 1, names), self.random.randint(2, 9))
+        return '({0} {1} {2})'.format(self.expression(depth - 1, names), operator,
+                                      self.expression(depth - 1, names))
+
+    def condition(self, names):
+        depth = self.expression_depth - 1
+        return '{0} {1} {2}'.format(self.expression(depth, names), self.random.choice(COMPARISONS),
+                                    self.expression(depth, names))
+
+    def assignment(self, indent, names):
+        return ['{0}{1} := {2};'.format(indent, self.random.choice(LOCALS), self.expression(self.expression_depth,
+                                                                                           names))]
+
+    def statement(self, depth, indent, names):
+        if depth < self.statement_depth and self.random.random() < 0.3:
+            lines = ['{0}if ({1}) {{'.format(indent, self.condition(names))]
+            lines.extend(self.statement(depth + 1, indent + '    ', names))
+            lines.append('{0}}} else {{'.format(indent))
+            lines.extend(self.statement(depth + 1, indent + '    ', names))
+            lines.append('{0}}}'.format(indent))
+            return lines
+        return self.assignment(indent, names)
+
+    def loop_nest(self, level, indent, names):
+        counter = 'i{0}'.format(level)
+        names = names + [counter]
+        lines = ['{0}for ({1} := 0; {1} < {2}; 1) {{'.format(indent, counter, self.trip_count)]
+        if level + 1 < self.loop_nesting:
+            lines.extend(self.loop_nest(level + 1, indent + '    ', names))
+        lines.extend(self.statement(1, indent + '    ', names))
+        lines.append('{0}}}'.format(indent))
+        return lines
+
+    def function(self, index, prints):
+        lines = ['int f{0}({1}) {{'.format(index, ', '.join(LOCALS))]
+        for _ in range(self.statements):
+            lines.extend(self.statement(0, '    ', LOCALS))
+        if self.loop_nesting > 0:
+            lines.extend(self.loop_nest(0, '    ', LOCALS))
+        for _ in range(prints):
+            lines.append('    print({0});'.format(self.expression(self.expression_depth, LOCALS)))
+        if index > 0:
+            lines.append('    f{0}({1});'.format(self.random.randrange(index), ', '.join(LOCALS)))
+        lines.append('    return 0;')
+        lines.append('}')
+        return lines
+
+    def lines(self):
+        # One function at a time, so large programs can be written without holding them in memory
+        for index in range(self.functions):
+            # Prints are spread evenly over the functions
+            prints = self.prints // self.functions + (1 if index < self.prints % self.functions else 0)
+            for line in self.function(index, prints):
+                yield line
+            yield ''
+        yield 'int main() {'
+        yield '    for (r := 0; r < {0}; 1) {{'.format(self.repeat)
+        yield '        f{0}(r, 1, 2, 3);'.format(self.functions - 1)
+        yield '    }'
+        yield '    return 0;'
+        yield '}'
+
+    def generate(self):
+        return '\n'.join(self.lines()) + '\n'
+
+
+def add_shape_arguments(arg_parser):
+    arg_parser.add_argument('--functions', type=int, default=100, help='number of functions besides main')
+    arg_parser.add_argument('--statements', type=int, default=10, help='top level statements per function')
+    arg_parser.add_argument('--statement-depth', type=int, default=2, help='maximum nesting of if statements')
+    arg_parser.add_argument('--expression-depth', type=int, default=3, help='maximum depth of expression trees')
+    arg_parser.add_argument('--loop-nesting', type=int, default=2, help='depth of the loop nest in every function')
+    arg_parser.add_argument('--prints', type=int, default=100, help='number of print statements in the program')
+    arg_parser.add_argument('--trip-count', type=int, default=8, help='iterations of every loop')
+    arg_parser.add_argument('--repeat', type=int, default=100, help='calls of the call tree from main')
+    arg_parser.add_argument('--seed', type=int, default=0)
+
+
+def shape_options(args):
+    return dict(functions=args.functions, statements=args.statements, statement_depth=args.statement_depth,
+                expression_depth=args.expression_depth, loop_nesting=args.loop_nesting, prints=args.prints,
+                trip_count=args.trip_count, repeat=args.repeat, seed=args.seed)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Writes a synthetic .gg program, see end_to_end.py.')
+    arg_parser.add_argument('-o', dest='output', help='output file (default: stdout)')
+    add_shape_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
+    source = ProgramGenerator(**shape_options(args)).generate()
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(source)
+    else:
+        print(source, end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.loop_kernels import kernel_source  # noqa: E402
+
+PROGRAMS = {
+    # A short script, over before anything gets hot
+    'script': """
+int main() {
+    for (i := 0; i < 20; 1) {
+        print(i * i);
+    }
+    return 0;
+}
+""",
+    # Most of the time is spent in a function called over and over, which gets compiled
+    'hot_calls': """
+int step(x, acc) {
+    for (i := 0; i < 1000; 1) {
+        acc := acc + i * x;
+    }
+    print(acc);
+    return 0;
+}
+
+int main() {
+    for (i := 0; i < 20000; 1) {
+        step(i, 0);
+    }
+    return 0;
+}
+""",
+    'primes': kernel_source('primes', 10000000),
+}
+
+MODES = [
+    ('jit', ['--run', '--no-cache']),
+    ('jit cached', ['--run']),
+    ('tiered', ['--tiered']),
+]
+
+
+def run(args, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, os.path.join(ROOT, 'gg')] + args, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='End to end time of gg --run against gg --tiered.')
+    arg_parser.add_argument('-r', '--runs', type=int, default=3)
+    arg_parser.add_argument('-O', dest='opt', default='2')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print('{0:>10} '.format('program') + ' '.join('{0:>12}'.format(mode) for mode, _ in MODES))
+        for name in sorted(PROGRAMS):
+            path = os.path.join(tmp_dir, name + '.gg')
+            with open(path, 'w') as f:
+                f.write(PROGRAMS[name])
+            # The first run fills the object cache for the cached mode
+            run([path, '--run', '-O' + args.opt], 1)
+            times = [run([path, '-O' + args.opt] + flags, args.runs) for _, flags in MODES]
+            print('{0:>10} '.format(name) + ' '.join('{0:>11.3f}s'.format(elapsed) for elapsed in times))
+
+
+if __name__ == '__main__':
+    main()
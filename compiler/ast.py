@@ -1,308 +1,192 @@
-from llvmlite import ir
+from types import GeneratorType
 
-from compiler.errors import CodeGenError
+# Operators are numbered by their position here once names are resolved, see compiler/semantic.py
+BINARY_OPERATORS = ['EQUAL_SIGN', 'SUM', 'SUB', 'MUL', 'DIV',
+                    'LESS', 'LESS_EQ', 'GREATER', 'GREATER_EQ', 'EQUALS', 'NOT_EQUALS']
+UNARY_OPERATORS = ['NOT', 'SUB', 'COMPLEMENT']
 
 
 class Node(object):
-    def generate(self):
-        pass
+    # Nodes only hold their structure; the fields double as slots, codegen context lives in the visitors
+    __slots__ = fields = ()
+
+    def walk(self):
+        # Pre-order in field order, with an explicit stack so deep trees do not hit the recursion limit
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            for field in reversed(node.fields):
+                value = getattr(node, field)
+                if isinstance(value, Node):
+                    stack.append(value)
+                elif isinstance(value, list):
+                    stack.extend(item for item in reversed(value) if isinstance(item, Node))
+
+    def dump(self):
+        # Flat serialization of the structure, child nodes follow their parent in walk() order
+        result = []
+        for node in self.walk():
+            result.append(type(node).__name__)
+            for field in node.fields:
+                value = getattr(node, field)
+                if isinstance(value, Node):
+                    result.append(Node)
+                elif isinstance(value, list):
+                    result.append(tuple(Node if isinstance(item, Node) else item for item in value))
+                else:
+                    result.append(value)
+        return tuple(result)
+
+
+class Visitor(object):
+    # Dispatches to visit_<NodeClass>. A visit method that is a generator yields child nodes and is sent back
+    # their results, so the visitor runs on an explicit stack instead of recursing down the tree.
+    def visit(self, node):
+        result = self._dispatch(node)
+        if not isinstance(result, GeneratorType):
+            return result
+
+        stack = [result]
+        value = None
+        while stack:
+            try:
+                child = stack[-1].send(value)
+            except StopIteration as e:
+                stack.pop()
+                value = e.value
+                continue
+            result = self._dispatch(child)
+            if isinstance(result, GeneratorType):
+                stack.append(result)
+                value = None
+            else:
+                value = result
+        return value
+
+    def _dispatch(self, node):
+        methods = self.__dict__.setdefault('_methods', {})
+        method = methods.get(type(node))
+        if method is None:
+            method = methods[type(node)] = getattr(self, 'visit_' + type(node).__name__)
+        return method(node)
 
 
 class Program(Node):
-    def __init__(self, cg, state, functions):
-        self.cg = cg
-        self.builder = cg.builder
-        self.module = cg.module
-        self.state = state
-        self.functions = functions
+    __slots__ = fields = ('functions',)
 
-    def generate(self):
-        main = None
-        for func in self.functions:
-            if func.prototype.name == 'main':
-                main = func
-            else:
-                func.generate()
-        if not main:
-            raise CodeGenError('No main function')
-        return main.generate()
+    def __init__(self, functions):
+        self.functions = functions
 
 
 class FunctionPrototype(Node):
-    def __init__(self, cg, state, name, arg_names):
-        self.cg = cg
-        self.builder = cg.builder
-        self.module = cg.module
-        self.state = state
+    __slots__ = fields = ('name', 'arg_names')
+
+    def __init__(self, name, arg_names):
         self.name = name
         self.arg_names = arg_names
 
-    def generate(self):
-        func_name = self.name
-        func_ty = ir.FunctionType(self.cg.int64, [self.cg.int64] * len(self.arg_names), False)
-        if func_name in self.module.globals:
-            func = self.module[func_name]
-            if not isinstance(func, ir.Function):
-                raise CodeGenError('Function / Global name collision', func_name)
-            if not func.is_declaration():
-                raise CodeGenError('Redefinition of {0}', func_name)
-            if len(func.function_type.args) != len(self.arg_names):
-                raise CodeGenError('Redefinition with different number of arguments')
-        else:
-            func = ir.Function(self.module, func_ty, func_name)
-
-        return func
-
 
 class Function(Node):
-    def __init__(self, cg, state, prototype, body, return_value):
-        self.cg = cg
-        self.builder = cg.builder
-        self.module = cg.module
-        self.state = state
+    fields = ('prototype', 'body', 'return_value')
+    # Names of the local variable slots: the arguments followed by one per loop counter
+    __slots__ = fields + ('slot_names',)
+
+    def __init__(self, prototype, body, return_value):
         self.prototype = prototype
         self.body = body
         self.return_value = return_value
-
-    def generate(self):
-        self.state.func_symbols = {}
-        func = self.prototype.generate()
-        block = func.append_basic_block('entry')
-        self.builder.position_at_end(block)
-
-        for i, arg in enumerate(func.args):
-            arg.name = self.prototype.arg_names[i]
-            address = self.builder.alloca(self.cg.int64, name=arg.name)
-            self.builder.store(arg, address)
-            self.state.func_symbols[arg.name] = address
-
-        for stmt in self.body:
-            stmt.generate()
-
-        result = self.return_value.generate()
-        self.builder.ret(result)
-        return func
+        self.slot_names = None
 
 
 class FunctionCall(Node):
-    def __init__(self, cg, state, name, args):
-        self.cg = cg
-        self.builder = cg.builder
-        self.module = cg.module
-        self.state = state
+    fields = ('name', 'args')
+    # Set by compiler/semantic.py when the call's result can be returned directly, see tail_statements
+    __slots__ = fields + ('tail',)
+
+    def __init__(self, name, args):
         self.name = name
         self.args = args
-
-    def generate(self):
-        callee_func = self.module.globals.get(self.name, None)
-        if not callee_func or not isinstance(callee_func, ir.Function):
-            raise CodeGenError('Call to unknown function', self.name)
-        if not callee_func.function_type.var_arg and len(callee_func.args) != len(self.args):
-            raise CodeGenError('Incorrect number of arguments', self.name)
-        call_args = [arg.generate() if isinstance(arg, Node) else arg for arg in self.args]
-        return self.builder.call(callee_func, call_args)
+        self.tail = False
 
 
 class Print(FunctionCall):
-    def __init__(self, cg, state, value):
-        super().__init__(cg, state, 'printf', [])
-        self.value = value
+    __slots__ = fields = ('value',)
 
-    def generate(self):
-        global_fmt = self.module.globals.get('println_number')
-        fmt_arg = self.builder.bitcast(global_fmt, ir.IntType(8).as_pointer())
-        self.args = [fmt_arg, self.value]
-        return super().generate()
+    def __init__(self, value):
+        super().__init__('printf', [])
+        self.value = value
 
 
 class Input(FunctionCall):
-    def __init__(self, cg, state, var):
-        super().__init__(cg, state, 'scanf', [])
-        self.var = var
+    fields = ('var',)
+    __slots__ = fields + ('slot',)
 
-    # TODO: Add message before input.
-    def generate(self):
-        global_fmt = self.module.globals.get('input_number')
-        fmt_arg = self.builder.bitcast(global_fmt, ir.IntType(8).as_pointer())
-        self.args = [fmt_arg, self.state.func_symbols[self.var]]
-        return super().generate()
+    def __init__(self, var):
+        super().__init__('scanf', [])
+        self.var = var
+        self.slot = None
 
 
 class IfStatement(Node):
-    def __init__(self, cg, state, condition, then_body, else_body):
-        self.cg = cg
-        self.builder = cg.builder
-        self.module = cg.module
-        self.state = state
+    __slots__ = fields = ('condition', 'then_body', 'else_body')
+
+    def __init__(self, condition, then_body, else_body):
         self.condition = condition
         self.then_body = then_body
         self.else_body = else_body
 
-    def generate(self):
-        cond_val = self.condition.generate()
-
-        then_block = self.builder.function.append_basic_block('then')
-        else_block = ir.Block(self.builder.function, 'else')
-        merge_block = ir.Block(self.builder.function, 'after_if')
-        self.builder.cbranch(cond_val, then_block, else_block)
-        self.builder.position_at_start(then_block)
-        then_val = None
-        for stmt in self.then_body:
-            then_val = stmt.generate()
-        self.builder.branch(merge_block)
-
-        self.builder.function.basic_blocks.append(else_block)
-        self.builder.position_at_start(else_block)
-        else_val = None
-        for stmt in self.else_body:
-            else_val = stmt.generate()
-        self.builder.branch(merge_block)
-
-        self.builder.function.basic_blocks.append(merge_block)
-        self.builder.position_at_start(merge_block)
-        phi = self.builder.phi(self.cg.int64, 'if_phi')
-        phi.add_incoming(then_val, then_block)
-        phi.add_incoming(else_val, else_block)
-        return phi
-
 
 class ForLoop(Node):
-    def __init__(self, cg, state, var_name, start, end_cond, step, body):
-        self.cg = cg
-        self.builder = cg.builder
-        self.module = cg.module
-        self.state = state
+    fields = ('var_name', 'start', 'end_cond', 'step', 'body')
+    __slots__ = fields + ('slot',)
+
+    def __init__(self, var_name, start, end_cond, step, body):
         self.var_name = var_name
         self.start = start
         self.end_cond = end_cond
         self.step = step
         self.body = body
-
-    # TODO: Prevent loop body when the initial condition is false.
-    def generate(self):
-        saved_block = self.builder.block
-        self.builder.goto_entry_block()
-        var_address = self.builder.alloca(self.cg.int64, name=self.var_name)
-        self.builder.position_at_end(saved_block)
-
-        start_val = self.start.generate()
-        self.builder.store(start_val, var_address)
-        loop_block = self.builder.function.append_basic_block('loop')
-
-        self.builder.branch(loop_block)
-        self.builder.position_at_start(loop_block)
-
-        # Save the variable value in case the counter variable name shadows it
-        old_var_address = self.state.func_symbols.get(self.var_name)
-        self.state.func_symbols[self.var_name] = var_address
-
-        # Add the loop body
-        for stmt in self.body:
-            stmt.generate()
-
-        # Decide how much to step
-        if self.step is None:
-            step_val = ir.Constant(self.cg.int64, 1)
-        else:
-            step_val = self.step.generate()
-        cur_var = self.builder.load(var_address, self.var_name)
-        next_value = self.builder.add(cur_var, step_val, 'next_value')
-        self.builder.store(next_value, var_address)
-
-        # Decide whether or not to break the loop
-        end_val = self.end_cond.generate()
-        cmp = self.builder.icmp_signed('!=', end_val, ir.Constant(self.cg.int64, 0), 'loop_cond')
-
-        after_block = self.builder.function.append_basic_block('after_loop')
-        self.builder.cbranch(cmp, loop_block, after_block)
-        self.builder.position_at_start(after_block)
-
-        # Restore the old variable value in case the counter name shadowed it
-        if old_var_address is not None:
-            self.state.func_symbols[self.var_name] = old_var_address
-        else:
-            del self.state.func_symbols[self.var_name]
-
-        return ir.Constant(self.cg.int64, 0)
+        self.slot = None
 
 
 class Variable(Node):
-    def __init__(self, cg, state, name):
-        self.cg = cg
-        self.builder = cg.builder
-        self.module = cg.module
-        self.state = state
-        self.name = name
+    fields = ('name',)
+    __slots__ = fields + ('slot',)
 
-    def generate(self):
-        var_address = self.state.func_symbols[self.name]
-        return self.builder.load(var_address, self.name)
+    def __init__(self, name):
+        self.name = name
+        self.slot = None
 
 
 class Number(Node):
-    def __init__(self, cg, state, value):
-        self.cg = cg
-        self.builder = cg.builder
-        self.module = cg.module
-        self.state = state
-        self.value = value
+    __slots__ = fields = ('value',)
 
-    def generate(self):
-        return ir.Constant(self.cg.int64, int(self.value))
+    def __init__(self, value):
+        self.value = value
 
 
 class UnaryOp(Node):
-    def __init__(self, cg, state, operator, value):
-        self.cg = cg
-        self.builder = cg.builder
-        self.module = cg.module
-        self.state = state
+    fields = ('operator', 'value')
+    __slots__ = fields + ('opcode',)
+
+    def __init__(self, operator, value):
         self.operator = operator
         self.value = value
-
-    def generate(self):
-        op = self.operator
-        if op == 'NOT':
-            return self.builder.select(
-                self.builder.icmp_signed('==', self.value.generate(), ir.Constant(self.cg.int64, 0)),
-                ir.Constant(self.cg.int64, 1), ir.Constant(self.cg.int64, 0))
-        elif op == 'SUB':
-            return self.builder.neg(self.value.generate())
-        elif op == 'COMPLEMENT':
-            return self.builder.not_(self.value.generate())
+        self.opcode = None
 
 
 class BinaryOp(Node):
-    def __init__(self, cg, state, operator, left, right):
-        self.cg = cg
-        self.builder = cg.builder
-        self.module = cg.module
-        self.state = state
+    fields = ('operator', 'left', 'right')
+    __slots__ = fields + ('opcode',)
+
+    def __init__(self, operator, left, right):
         self.operator = operator
         self.left = left
         self.right = right
+        self.opcode = None
+
 
-    def generate(self):
-        op = self.operator
-        if op == 'EQUAL_SIGN':
-            if not isinstance(self.left, Variable):
-                raise CodeGenError('Invalid assignment')
-            var_address = self.state.func_symbols[self.left.name]
-            value = self.right.generate()
-            self.builder.store(value, var_address)
-            return value
-        elif op == 'SUM':
-            return self.builder.add(self.left.generate(), self.right.generate())
-        elif op == 'SUB':
-            return self.builder.sub(self.left.generate(), self.right.generate())
-        elif op == 'MUL':
-            return self.builder.mul(self.left.generate(), self.right.generate())
-        elif op == 'DIV':
-            return self.builder.sdiv(self.left.generate(), self.right.generate())
-        elif op == 'LESS' or op == 'LESS_EQ' or op == 'GREATER' or op == 'GREATER_EQ' \
-                or op == 'EQUALS' or op == 'NOT_EQUALS':
-
-            standard_ops = {
-                'LESS': '<', 'LESS_EQ': '<=', 'GREATER': '>', 'GREATER_EQ': '>=', 'EQUALS': '==', 'NOT_EQUALS': '!='
-            }
-            return self.builder.icmp_signed(standard_ops[op], self.left.generate(), self.right.generate())
+def callees(node):
+    # Names of the functions called anywhere in node, without print and input
+    return sorted(set(child.name for child in node.walk() if type(child) is FunctionCall))
@@ -0,0 +1,54 @@
+import json
+import os
+import socket
+import struct
+import sys
+
+from appdirs import AppDirs
+
+# Requests are a length prefixed JSON object sent together with the client's stdin, stdout and stderr, so the
+# server can run programs straight on the client's terminal or pipes
+HEADER = struct.Struct('!Q')
+
+
+def default_socket_path():
+    return os.environ.get('GG_SOCKET') or os.path.join(AppDirs('gg').user_cache_dir, 'serve.sock')
+
+
+def connect(path=None):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path or default_socket_path())
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def request(sock, argv):
+    payload = json.dumps({'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ)}).encode('utf-8')
+    sys.stdout.flush()
+    sys.stderr.flush()
+    socket.send_fds(sock, [HEADER.pack(len(payload))], [0, 1, 2])
+    sock.sendall(payload)
+
+    response = b''
+    while not response.endswith(b'\n'):
+        data = sock.recv(4096)
+        if not data:
+            raise ConnectionError('gg server closed the connection')
+        response += data
+    return json.loads(response.decode('utf-8'))['status']
+
+
+def main(argv=None):
+    # Same command line as gg; runs on a `gg serve` server when one is up, otherwise in this process
+    argv = sys.argv[1:] if argv is None else argv
+    sock = connect()
+    if sock is None:
+        from compiler.driver import main as driver_main
+        return driver_main(argv)
+    try:
+        return request(sock, argv)
+    finally:
+        sock.close()
@@ -1,22 +1,92 @@
 from ctypes import CFUNCTYPE, c_int
+from functools import lru_cache
 
 from llvmlite import binding, ir
 
+from compiler.runtime import BufferedRuntime
+from compiler.stats import NO_STATS
+
+# Bumped whenever the same program compiles to different code, so cached objects of older versions are not reused
+CODEGEN_VERSION = 5
+
+
+def default_inline_threshold(opt_level, size_level):
+    # The thresholds clang picks for -O2/-O3/-Os/-Oz; no inliner at -O0
+    if opt_level == 0:
+        return None
+    if size_level > 0:
+        return 75 if size_level == 1 else 25
+    return 250 if opt_level >= 3 else 225
+
+
+# A CodeGen built ahead of time by warm_up, whose LLVM objects the next matching CodeGen takes over
+_warm = None
+# A function to compile once in warm_up, so the pass manager and target machine have run before the first request
+WARM_UP_IR = 'define i64 @warm_up(i64 %x) {\n  %y = add i64 %x, 1\n  ret i64 %y\n}\n'
+
+
+@lru_cache(maxsize=None)
+def host_cpu_name(llvm):
+    return llvm.get_host_cpu_name()
+
+
+@lru_cache(maxsize=None)
+def host_cpu_features(llvm):
+    try:
+        return llvm.get_host_cpu_features().flatten()
+    except RuntimeError:
+        # Not every host can report its features, the CPU name alone still selects them
+        return ''
+
+
+def count_instructions(mod):
+    return sum(len(list(block.instructions)) for func in mod.functions for block in func.blocks)
+
 
 class CodeGen(object):
-    def __init__(self):
+    def __init__(self, opt_level=2, size_level=0, object_cache=None, buffered_io=False, inline_threshold=None,
+                 loop_vectorize=None, slp_vectorize=None, cpu=None, features=None, direct_ssa=False, stats=None,
+                 profile_generate=None, profile=None):
         self.llvm = binding
         self.llvm.initialize()
         self.llvm.initialize_native_target()
         self.llvm.initialize_native_asmprinter()
+
+        # Unset options follow the optimization level and the host, like clang -march=native
+        self.opt_level = opt_level
+        self.size_level = size_level
+        if inline_threshold is None:
+            inline_threshold = default_inline_threshold(opt_level, size_level)
+        self.inline_threshold = inline_threshold
+        vectorize = opt_level >= 2 and size_level < 2
+        self.loop_vectorize = vectorize if loop_vectorize is None else loop_vectorize
+        self.slp_vectorize = vectorize if slp_vectorize is None else slp_vectorize
+        self.cpu = host_cpu_name(self.llvm) if cpu is None else cpu
+        self.features = host_cpu_features(self.llvm) if features is None else features
+
+        self.object_cache = object_cache
+        self.runtime = BufferedRuntime() if buffered_io else None
+        # Generate SSA form directly instead of stack slots, see compiler/generator.py
+        self.direct_ssa = direct_ssa
+        # Profile guided optimization: the file an instrumented program writes its counts to, or the Profile of
+        # such a run to optimize with, see compiler/profile.py
+        self.profile_generate = profile_generate
+        self.profile = profile
+        # Phase timings and counts, see compiler/stats.py; LLVM times its passes while they are recorded
+        self.stats = NO_STATS if stats is None else stats
+        if self.stats.enabled:
+            self.llvm.set_time_passes(True)
+        self._object_keys = set()
+        self._module_pass_manager = None
+        # The IR and optimized module of the last emit(keep=True), which create_ir runs instead of optimizing again
+        self._emitted = None
+
         self._config_llvm()
-        self._create_execution_engine()
+        if not self._take_warm():
+            self._create_execution_engine()
 
         self._create_types()
-        self._declare_global_string('println_number', '%lld\n\0')
-        self._declare_global_string('input_number', '%lld\x00')
-        self._declare_print_function()
-        self._declare_input_function()
+        self.new_module()
 
     def _create_types(self):
         self.int64 = ir.IntType(64)
@@ -24,17 +94,57 @@ class CodeGen(object):
         self.voidptr = ir.IntType(8).as_pointer()
 
     def _config_llvm(self):
-        self.module = ir.Module(name=__file__)
-        self.module.triple = self.llvm.get_default_triple()
         self.builder = ir.IRBuilder()
 
+    def new_module(self, name=__file__):
+        # Every module gets its own copy of the runtime declarations and format strings
+        self.module = ir.Module(name=name)
+        self.module.triple = self.llvm.get_default_triple()
+        self._declare_global_string('println_number', '%lld\n\0')
+        self._declare_global_string('input_number', '%lld\x00')
+        self._declare_print_function()
+        self._declare_input_function()
+        if self.runtime is not None:
+            self.runtime.declare(self.module)
+        return self.module
+
+    def pipeline_options(self):
+        # Keyword arguments that give another CodeGen, e.g. in a worker process, the same optimization pipeline
+        return dict(opt_level=self.opt_level, size_level=self.size_level, inline_threshold=self.inline_threshold,
+                    loop_vectorize=self.loop_vectorize, slp_vectorize=self.slp_vectorize,
+                    cpu=self.cpu, features=self.features)
+
     def _create_execution_engine(self):
+        # The JIT and emitted objects target the same CPU, so both get to use its vector units
         target = self.llvm.Target.from_default_triple()
-        target_machine = target.create_target_machine()
+        target_machine = target.create_target_machine(cpu=self.cpu, features=self.features, opt=self.opt_level,
+                                                      jit=True)
         backing_mod = binding.parse_assembly('')
         engine = binding.create_mcjit_compiler(backing_mod, target_machine)
+        if self.object_cache is not None:
+            engine.set_object_cache(self._object_compiled, self._object_lookup)
         self.engine = engine
 
+        # Position independent so the emitted objects link into default (PIE) executables
+        self.target_machine = target.create_target_machine(cpu=self.cpu, features=self.features, opt=self.opt_level,
+                                                           reloc='pic', codemodel='default')
+
+    def _take_warm(self):
+        # The target machines and pass manager of warm_up's CodeGen are reused when they target the same machine
+        # and pipeline. Its engine only serves one CodeGen, since that one adds its modules to it.
+        global _warm
+        warm = _warm
+        if warm is None or (warm.cpu, warm.features, warm.opt_level) != (self.cpu, self.features, self.opt_level):
+            return False
+        _warm = None
+        self.engine = warm.engine
+        if self.object_cache is not None:
+            self.engine.set_object_cache(self._object_compiled, self._object_lookup)
+        self.target_machine = warm.target_machine
+        if warm.pipeline_options() == self.pipeline_options():
+            self._module_pass_manager = warm._module_pass_manager
+        return True
+
     def _declare_global_string(self, name, string):
         var_ty = ir.ArrayType(self.int8, len(string))
         var = ir.Constant(var_ty, bytearray(string.encode('utf-8')))
@@ -51,20 +161,113 @@ class CodeGen(object):
         scanf_ty = ir.FunctionType(self.int64, [self.voidptr], var_arg=True)
         ir.Function(self.module, scanf_ty, name='scanf')
 
+    def _print_ir(self):
+        with self.stats.phase('print_ir'):
+            return str(self.module)
+
+    def _pass_manager(self):
+        # Built once and run on every module, which matters when many small modules are added, e.g. by the REPL
+        if self._module_pass_manager is None:
+            pm_builder = self.llvm.create_pass_manager_builder()
+            pm_builder.opt_level = self.opt_level
+            pm_builder.size_level = self.size_level
+            if self.inline_threshold is not None:
+                pm_builder.inlining_threshold = self.inline_threshold
+            pm_builder.loop_vectorize = self.loop_vectorize
+            pm_builder.slp_vectorize = self.slp_vectorize
+            pm = self.llvm.create_module_pass_manager()
+            self.target_machine.add_analysis_passes(pm)
+            pm_builder.populate(pm)
+            self._module_pass_manager = pm
+        return self._module_pass_manager
+
+    def _optimize_ir(self, llvm_ir=None):
+        if llvm_ir is None:
+            llvm_ir = self._print_ir()
+        with self.stats.phase('parse_ir'):
+            mod = self.llvm.parse_assembly(llvm_ir)
+            mod.verify()
+        # The vectorizers only know the vector width and instruction costs through the target's data layout and
+        # analysis passes
+        mod.data_layout = str(self.target_machine.target_data)
+
+        pm = self._pass_manager()
+        if self.stats.enabled:
+            self.stats.count('ir_instructions', count_instructions(mod))
+        with self.stats.phase('optimize'):
+            pm.run(mod)
+        if self.stats.enabled:
+            self.stats.count('optimized_ir_instructions', count_instructions(mod))
+        return mod
+
+    def collect_pass_timings(self):
+        # Moves the time LLVM spent per pass so far into the stats and stops timing passes
+        if self.stats.enabled:
+            self.stats.add_pass_timings(self.llvm.report_and_reset_timings())
+            self.llvm.set_time_passes(False)
+
+    def target_key(self):
+        return (CODEGEN_VERSION, self.opt_level, self.size_level, self.inline_threshold, self.loop_vectorize,
+                self.slp_vectorize, self.runtime is not None, self.direct_ssa, self.module.triple, self.cpu,
+                self.features, self.profile_generate, self.profile and self.profile.key())
+
+    def _object_key(self, llvm_ir):
+        return self.object_cache.key(llvm_ir, *self.target_key())
+
+    def _object_compiled(self, mod, data):
+        if mod.name in self._object_keys:
+            self.object_cache.put(mod.name, data)
+
+    def _object_lookup(self, mod):
+        if mod.name in self._object_keys:
+            return self.object_cache.get(mod.name)
+        return None
+
     def _compile_ir(self):
-        llvm_ir = str(self.module)
-        mod = self.llvm.parse_assembly(llvm_ir)
-        mod.verify()
+        llvm_ir = self._print_ir() if self.object_cache is not None or self._emitted is not None else None
+        emitted, self._emitted = self._emitted, None
+        key = self._object_key(llvm_ir) if self.object_cache is not None else None
+        if emitted is not None and emitted[0] == llvm_ir:
+            # Already optimized by emit, e.g. for --emit with --run
+            mod = emitted[1]
+        elif key is not None and self.object_cache.get(key) is not None:
+            # A cached object for the unoptimized IR means MCJIT can skip both optimization and codegen
+            with self.stats.phase('parse_ir'):
+                mod = self.llvm.parse_assembly(llvm_ir)
+        else:
+            mod = self._optimize_ir(llvm_ir)
+        if key is not None:
+            # The engine hands the module back to the cache callbacks, the name identifies its entry
+            mod.name = key
+            self._object_keys.add(key)
+        with self.stats.phase('finalize_object'):
+            self.engine.add_module(mod)
+            self.engine.finalize_object()
+        self.engine.run_static_constructors()
+
+    def add_module(self, llvm_ir):
+        # Links more code into the running engine; it can call functions of the modules added before
+        mod = self._optimize_ir(llvm_ir)
+        with self.stats.phase('finalize_object'):
+            self.engine.add_module(mod)
+            self.engine.finalize_object()
+        return mod
 
-        pm_builder = self.llvm.create_pass_manager_builder()
-        pm_builder.opt_level = 2
-        pm = self.llvm.create_module_pass_manager()
-        pm_builder.populate(pm)
-        pm.run(mod)
+    def compile_object(self, llvm_ir):
+        mod = self._optimize_ir(llvm_ir)
+        with self.stats.phase('emit'):
+            return self.target_machine.emit_object(mod)
 
-        self.engine.add_module(mod)
+    def load_objects(self, objects):
+        # Objects emitted by emit('obj'), e.g. one per function, linked together by the engine
+        for data in objects:
+            self.engine.add_object_file(self.llvm.ObjectFileRef.from_data(data))
+        self.engine.finalize_object()
+
+    def load_object_files(self, paths):
+        for path in paths:
+            self.engine.add_object_file(self.llvm.ObjectFileRef.from_path(path))
         self.engine.finalize_object()
-        self.engine.run_static_constructors()
 
     def run(self, recompile=True):
         if recompile:
@@ -78,3 +281,30 @@ class CodeGen(object):
     def save_ir(self, filename):
         with open(filename, 'w') as f:
             f.write(str(self.module))
+
+    def emit(self, kind, keep=False):
+        # Optimized output straight from the target machine, no text IR or llc in between. With keep the optimized
+        # module is held on to for the next create_ir, so a program that is also run is only optimized once.
+        llvm_ir = self._print_ir()
+        mod = self._optimize_ir(llvm_ir)
+        self._emitted = (llvm_ir, mod) if keep else None
+        with self.stats.phase('emit'):
+            if kind == 'll':
+                return str(mod).encode('utf-8')
+            elif kind == 'bc':
+                return mod.as_bitcode()
+            elif kind == 'asm':
+                return self.target_machine.emit_assembly(mod).encode('utf-8')
+            elif kind == 'obj':
+                return self.target_machine.emit_object(mod)
+        raise ValueError('Unknown output kind', kind)
+
+
+def warm_up(**options):
+    # Builds a CodeGen for options, runs its pipeline once and keeps it for the next CodeGen with the same target,
+    # which skips setting up LLVM. gg serve warms up before forking, so every request finds it ready.
+    global _warm
+    cg = CodeGen(**options)
+    cg.compile_object(WARM_UP_IR)
+    _warm = cg
+    return cg
@@ -0,0 +1,421 @@
+import argparse
+import os
+import subprocess
+import sys
+import shutil
+import tempfile
+import time
+
+from rply import LexingError
+
+from compiler.ast import Program
+from compiler.errors import CodeGenError, ExecutionError, SemanticError
+from compiler.interpreter import HOT_THRESHOLD, Interpreter
+from compiler.lexer import Lexer
+from compiler.objcache import ObjectCache
+from compiler.optimize import ConstantFolder
+from compiler.parser import Parser, ParserState
+from compiler.profile import Profile
+from compiler.semantic import Resolver
+from compiler.stats import FORMATS, HOOKS, NO_STATS, Stats
+
+# Modules that load LLVM are imported where they are used, so --tiered runs start without it
+
+OBJ_SUFFIX = '.obj' if os.name == 'nt' else '.o'
+EXE_SUFFIX = '.exe' if os.name == 'nt' else ''
+EMIT_SUFFIXES = {'ll': '.ll', 'bc': '.bc', 'asm': '.s', 'obj': OBJ_SUFFIX, 'exe': EXE_SUFFIX}
+
+# -O<level> to (opt_level, size_level)
+OPT_LEVELS = {'0': (0, 0), '1': (1, 0), '2': (2, 0), '3': (3, 0), 's': (2, 1), 'z': (2, 2)}
+
+
+def create_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='gg', description='Compiler for the gg language.')
+    arg_parser.add_argument('inputs', nargs='+', metavar='file', help='.gg source files')
+    arg_parser.add_argument('-o', dest='output', help='output file, - for standard output with --emit ll or asm')
+    arg_parser.add_argument('--emit', choices=sorted(EMIT_SUFFIXES),
+                            help='kind of output to write (default: exe unless --run is given)')
+    arg_parser.add_argument('-O', dest='opt', choices=sorted(OPT_LEVELS), default='2', help='optimization level')
+    arg_parser.add_argument('--inline-threshold', type=int, help='inliner threshold (default: set by -O)')
+    arg_parser.add_argument('--no-loop-vectorize', dest='loop_vectorize', action='store_false', default=None,
+                            help='disable the loop vectorizer (default: on at -O2 and above)')
+    arg_parser.add_argument('--no-slp-vectorize', dest='slp_vectorize', action='store_false', default=None,
+                            help='disable the SLP vectorizer (default: on at -O2 and above)')
+    arg_parser.add_argument('--mcpu', dest='cpu', help='target CPU (default: the host CPU)')
+    arg_parser.add_argument('--mattr', dest='features',
+                            help='target features, e.g. +avx2,-avx512f (default: those of the host CPU)')
+    arg_parser.add_argument('--direct-ssa', action='store_true',
+                            help='generate SSA form with phis instead of stack slots, mostly faster at -O0/-O1')
+    arg_parser.add_argument('--profile-generate', metavar='FILE',
+                            help='instrument the program to write a profile to FILE when main returns')
+    arg_parser.add_argument('--profile-use', metavar='FILE',
+                            help='optimize for the branches and calls counted in a profile of --profile-generate')
+    arg_parser.add_argument('--run', action='store_true', help='run main with the JIT, exit with its return value')
+    arg_parser.add_argument('--tiered', action='store_true',
+                            help='run main in the interpreter right away, compiling only functions that get hot')
+    arg_parser.add_argument('--jit-threshold', type=int, default=HOT_THRESHOLD,
+                            help='calls plus loop iterations after which --tiered compiles a function')
+    arg_parser.add_argument('--buffered-io', action='store_true',
+                            help='print and read through a buffered runtime instead of printf/scanf')
+    arg_parser.add_argument('--no-fold', action='store_true', help='skip constant folding of the AST')
+    arg_parser.add_argument('--no-cache', action='store_true', help='do not use the JIT object cache')
+    arg_parser.add_argument('--cache-dir', help='directory of the JIT object cache')
+    arg_parser.add_argument('--incremental', action='store_true',
+                            help='compile every function separately and reuse objects of unchanged functions')
+    arg_parser.add_argument('--watch', action='store_true', help='rebuild incrementally whenever an input changes')
+    arg_parser.add_argument('-j', '--jobs', type=int,
+                            help='split the program into modules optimized and compiled by this many processes')
+    arg_parser.add_argument('--stream', action='store_true',
+                            help='read and compile a batch of functions at a time, with memory bounded by the batch '
+                                 'instead of the program, for very large generated sources')
+    arg_parser.add_argument('--project', action='store_true',
+                            help='compile every file (directories: their .gg files) to its own object, rebuilding '
+                                 'only files that changed or whose callees changed; -j defaults to the CPU count')
+    arg_parser.add_argument('--stats', choices=sorted(FORMATS),
+                            help='report time and peak memory per phase, code size and LLVM pass timings')
+    arg_parser.add_argument('--time-report', dest='stats', action='store_const', const='text',
+                            help='same as --stats=text')
+    arg_parser.add_argument('--stats-file', help='write the --stats report to this file instead of stderr')
+    return arg_parser
+
+
+def read_source(filename):
+    with open(filename, 'r') as f:
+        return f.read()
+
+
+def parse_sources(sources, fold=True, stats=NO_STATS):
+    # Parsed and folded, but names are not resolved yet, see parse_program
+    with stats.phase('load_parser'):
+        lexer = Lexer().get_lexer()
+        pg = Parser()
+        pg.parse()
+        parser = pg.get_parser()
+
+    # The parser pulls tokens from the lexer as it goes, so lexing is part of the parse phase
+    state = ParserState()
+    functions = []
+    with stats.phase('parse'):
+        for text in sources:
+            functions.extend(parser.parse(lexer.lex(text), state=state).functions)
+    program = Program(functions)
+    if fold:
+        with stats.phase('fold'):
+            ConstantFolder().fold_program(program)
+    return program
+
+
+def parse_program(sources, fold=True, stats=NO_STATS, defined=None):
+    # Names are resolved before folding, whether a program is accepted does not depend on --no-fold
+    program = parse_sources(sources, False, stats)
+    resolver = Resolver()
+    with stats.phase('resolve'):
+        resolver.resolve(program, defined)
+    if fold:
+        with stats.phase('fold'):
+            ConstantFolder().fold_program(program)
+    resolver.mark_tail_calls(program)
+    if stats.enabled:
+        stats.count('source_bytes', sum(len(text) for text in sources))
+        stats.count('functions', len(program.functions))
+        stats.count('ast_nodes', sum(1 for _ in program.walk()))
+    return program
+
+
+def codegen_options(args):
+    # Pipeline options of the command line, as keyword arguments of CodeGen
+    return dict(inline_threshold=args.inline_threshold, loop_vectorize=args.loop_vectorize,
+                slp_vectorize=args.slp_vectorize, cpu=args.cpu, features=args.features,
+                direct_ssa=args.direct_ssa, profile_generate=args.profile_generate,
+                profile=args.profile_use and Profile.load(args.profile_use))
+
+
+def compile_sources(sources, opt='2', object_cache=None, fold=True, buffered_io=False, **options):
+    from compiler.codegen import CodeGen
+    from compiler.generator import create_generator
+
+    opt_level, size_level = OPT_LEVELS[opt]
+    cg = CodeGen(opt_level, size_level, object_cache, buffered_io, **options)
+    program = parse_program(sources, fold, cg.stats)
+    with cg.stats.phase('generate'):
+        create_generator(cg).generate(program)
+    return cg
+
+
+def link_objects(objects, output, relocatable=False):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        obj_files = []
+        for i, data in enumerate(objects):
+            obj_files.append(os.path.join(tmp_dir, '{0}{1}'.format(i, OBJ_SUFFIX)))
+            with open(obj_files[-1], 'wb') as f:
+                f.write(data)
+        link_object_files(obj_files, output, relocatable)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def link_object_files(obj_files, output, relocatable=False):
+    # The objects come straight from LLVM; the system C compiler only links them (against libc for executables)
+    linker = os.environ.get('CC', 'gcc' if os.name == 'nt' else 'cc')
+    flags = ['-nostdlib', '-r'] if relocatable else []
+    subprocess.check_call([linker] + flags + obj_files + ['-o', output])
+
+
+def project_files(inputs):
+    # Directories stand for the .gg files below them, in a stable order so objects link the same way every time
+    paths = []
+    for path in inputs:
+        if not os.path.isdir(path):
+            paths.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.gg'))
+    return paths
+
+
+def default_output(inputs, emit):
+    if os.path.isdir(inputs[0]):
+        # Named after a project directory, inside it since an executable could not sit next to it
+        directory = os.path.normpath(inputs[0])
+        return os.path.join(directory, os.path.basename(os.path.abspath(directory)) + EMIT_SUFFIXES[emit])
+    return os.path.splitext(inputs[0])[0] + EMIT_SUFFIXES[emit]
+
+
+def write_output(cg, emit, output, stats=NO_STATS, keep=False):
+    if emit == 'exe':
+        objects = [cg.emit('obj', keep)]
+        with stats.phase('link'):
+            link_objects(objects, output)
+    elif output == '-':
+        sys.stdout.buffer.write(cg.emit(emit, keep))
+        sys.stdout.flush()
+    else:
+        with open(output, 'wb') as f:
+            f.write(cg.emit(emit, keep))
+
+
+def interpret(args, stats=NO_STATS):
+    # Starts right away in the interpreter, hot functions are compiled with the same options as a normal build;
+    # their compilation shows up in the stats as phases within run
+    sources = [read_source(filename) for filename in args.inputs]
+    opt_level, size_level = OPT_LEVELS[args.opt]
+    interpreter = Interpreter(parse_program(sources, not args.no_fold, stats), args.jit_threshold,
+                              opt_level=opt_level, size_level=size_level, stats=stats, **codegen_options(args))
+    with stats.phase('run'):
+        status = interpreter.run()
+    if interpreter.cg is not None:
+        interpreter.cg.collect_pass_timings()
+    return status
+
+
+def build(args, emit, stats=NO_STATS):
+    from compiler.codegen import CodeGen
+    from compiler.incremental import IncrementalCompiler
+    from compiler.split import ParallelCompiler
+
+    output = args.output or (emit and default_output(args.inputs, emit))
+    if args.project:
+        return build_project(args, emit, output, stats)
+    if args.stream:
+        return build_stream(args, emit, output, stats)
+    sources = [read_source(filename) for filename in args.inputs]
+
+    if not (args.incremental or args.jobs) or emit in ('ll', 'bc', 'asm'):
+        object_cache = ObjectCache(args.cache_dir) if args.run and not args.no_cache else None
+        cg = compile_sources(sources, args.opt, object_cache, not args.no_fold, args.buffered_io,
+                             stats=stats, **codegen_options(args))
+        if cg.profile is not None and cg.profile.stale:
+            sys.stderr.write('gg: warning: no matching profile for {0}\n'.format(', '.join(cg.profile.stale)))
+        if emit is not None:
+            write_output(cg, emit, output, stats, keep=args.run)
+        if args.run:
+            cg.create_ir()
+        cg.collect_pass_timings()
+        if args.run:
+            with stats.phase('run'):
+                return cg.run(False)
+        return 0
+
+    # Separately compiled modules, linked by the JIT engine or the system linker. Worker processes do not report
+    # their phases, the compile phase covers them.
+    start = time.perf_counter()
+    opt_level, size_level = OPT_LEVELS[args.opt]
+    cg = CodeGen(opt_level, size_level, buffered_io=args.buffered_io, stats=stats, **codegen_options(args))
+    program = parse_program(sources, not args.no_fold, stats)
+    with stats.phase('compile'):
+        if args.incremental:
+            compiler = IncrementalCompiler(cg, ObjectCache(args.cache_dir), args.jobs or 1)
+            objects = compiler.build(program)
+            stats.count('compiled_functions', len(compiler.compiled))
+            stats.count('reused_functions', len(compiler.reused))
+            sys.stderr.write('gg: compiled {0}, reused {1} functions in {2:.1f} ms\n'.format(
+                len(compiler.compiled), len(compiler.reused), (time.perf_counter() - start) * 1000))
+        else:
+            objects = ParallelCompiler(cg, args.jobs).build(program)
+    if emit is not None:
+        with stats.phase('link'):
+            link_objects(objects, output, relocatable=emit == 'obj')
+
+    if args.run:
+        with stats.phase('finalize_object'):
+            cg.load_objects(objects)
+    cg.collect_pass_timings()
+    if args.run:
+        with stats.phase('run'):
+            return cg.run(False)
+    return 0
+
+
+def build_project(args, emit, output, stats=NO_STATS):
+    from compiler.codegen import CodeGen
+    from compiler.project import ProjectCompiler
+
+    start = time.perf_counter()
+    opt_level, size_level = OPT_LEVELS[args.opt]
+    cg = CodeGen(opt_level, size_level, buffered_io=args.buffered_io, stats=stats, **codegen_options(args))
+    paths = project_files(args.inputs)
+    if not paths:
+        raise CodeGenError('No .gg files in {0}'.format(', '.join(args.inputs)))
+    with stats.phase('compile'):
+        compiler = ProjectCompiler(cg, ObjectCache(args.cache_dir), args.jobs, not args.no_fold)
+        objects = compiler.build(paths, needs_main=emit == 'exe' or args.run)
+    stats.count('compiled_files', len(compiler.compiled))
+    stats.count('reused_files', len(compiler.reused))
+    sys.stderr.write('gg: compiled {0}, reused {1} files in {2:.1f} ms\n'.format(
+        len(compiler.compiled), len(compiler.reused), (time.perf_counter() - start) * 1000))
+    if emit is not None:
+        with stats.phase('link'):
+            link_objects(objects, output, relocatable=emit == 'obj')
+
+    if args.run:
+        with stats.phase('finalize_object'):
+            cg.load_objects(objects)
+        with stats.phase('run'):
+            return cg.run(False)
+    return 0
+
+
+def build_stream(args, emit, output, stats=NO_STATS):
+    from compiler.codegen import CodeGen
+    from compiler.stream import StreamCompiler
+
+    opt_level, size_level = OPT_LEVELS[args.opt]
+    cg = CodeGen(opt_level, size_level, buffered_io=args.buffered_io, stats=stats, **codegen_options(args))
+    compiler = StreamCompiler(cg, not args.no_fold)
+    try:
+        obj_files = compiler.build(args.inputs, needs_main=emit == 'exe' or args.run)
+        if emit is not None:
+            with stats.phase('link'):
+                link_object_files(obj_files, output, relocatable=emit == 'obj')
+        if args.run:
+            with stats.phase('finalize_object'):
+                cg.load_object_files(obj_files)
+    finally:
+        compiler.close()
+    cg.collect_pass_timings()
+    if args.run:
+        with stats.phase('run'):
+            return cg.run(False)
+    return 0
+
+
+def create_stats(args):
+    # Recorded for --stats and whenever a hook wants the numbers, see compiler/stats.py
+    return Stats() if args.stats or HOOKS else NO_STATS
+
+
+def report_stats(args, stats):
+    if not stats.enabled:
+        return
+    report = stats.finish()
+    if args.stats is None:
+        return
+    text = FORMATS[args.stats](report)
+    if args.stats_file:
+        with open(args.stats_file, 'w') as f:
+            f.write(text)
+    else:
+        sys.stderr.write(text)
+
+
+def build_with_stats(args, emit):
+    stats = create_stats(args)
+    status = build(args, emit, stats)
+    report_stats(args, stats)
+    return status
+
+
+def watch(args, emit):
+    mtimes = None
+    try:
+        while True:
+            filenames = project_files(args.inputs) if args.project else args.inputs
+            current = [(filename, os.path.getmtime(filename) if os.path.exists(filename) else None)
+                       for filename in filenames]
+            if current != mtimes:
+                mtimes = current
+                try:
+                    build_with_stats(args, emit)
+                except BUILD_ERRORS as e:
+                    sys.stderr.write('gg: error: {0}\n'.format(e))
+                sys.stdout.flush()
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        return 0
+
+
+BUILD_ERRORS = (IOError, CodeGenError, SemanticError, ExecutionError, ValueError, LexingError,
+                subprocess.CalledProcessError)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['serve']:
+        from compiler.server import main as serve_main
+        return serve_main(argv[1:])
+    if argv[:1] == ['repl']:
+        from compiler.repl import main as repl_main
+        return repl_main(argv[1:])
+
+    arg_parser = create_arg_parser()
+    args = arg_parser.parse_args(argv)
+    emit = args.emit
+    if emit is None and not args.run:
+        emit = 'exe'
+    if args.watch and not args.project:
+        args.incremental = True
+    if args.incremental and args.no_cache:
+        arg_parser.error('--incremental needs the object cache')
+    if args.tiered and (args.emit or args.incremental or args.jobs or args.buffered_io):
+        arg_parser.error('--tiered only runs the program, without --emit, --incremental, -j or --buffered-io')
+    if (args.profile_generate or args.profile_use) and \
+            (args.tiered or args.incremental or args.jobs or args.project or args.stream):
+        arg_parser.error('profiles need the whole program in one module, without --tiered, --incremental, -j, '
+                         '--project or --stream')
+    if args.project and (args.tiered or args.incremental or emit in ('ll', 'bc', 'asm')):
+        arg_parser.error('--project builds objects, executables or runs, without --tiered or --incremental')
+    if args.stream and (args.tiered or args.incremental or args.project or args.jobs or emit in ('ll', 'bc', 'asm')):
+        arg_parser.error('--stream builds objects, executables or runs, without --tiered, --incremental, --project '
+                         'or -j')
+    if args.output == '-' and emit not in (None, 'll', 'asm'):
+        arg_parser.error('-o - writes text to standard output, only with --emit ll or asm')
+    if args.project and args.no_cache:
+        arg_parser.error('--project needs the object cache')
+
+    if args.watch:
+        return watch(args, emit)
+    try:
+        if args.tiered:
+            stats = create_stats(args)
+            status = interpret(args, stats)
+            report_stats(args, stats)
+            return status
+        return build_with_stats(args, emit)
+    except BUILD_ERRORS as e:
+        arg_parser.exit(1, 'gg: error: {0}\n'.format(e))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
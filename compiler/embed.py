@@ -0,0 +1,139 @@
+import array
+import ctypes
+from collections import namedtuple
+
+from compiler.codegen import CodeGen
+from compiler.driver import OPT_LEVELS, parse_program
+from compiler.generator import IRGenerator, create_generator
+from compiler.stats import HOOKS, NO_STATS, Stats
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BATCH_PREFIX = '__gg_batch_'
+# memoryview formats of native 64 bit integers, numpy's int64 shows up as 'l' on most 64 bit platforms
+INT64_FORMATS = ('q', 'l', '@q', '@l', '=q', '=l')
+
+# stride is in elements, 0 broadcasts a scalar; owner keeps the memory alive during the call
+Buffer = namedtuple('Buffer', ['address', 'stride', 'length', 'owner'])
+
+
+def int64_buffer(obj, writable=False):
+    # A pointer into a 1-d int64 buffer without copying it. Inputs that are read-only or not contiguous and have no
+    # array interface are copied; outputs are always written in place, so such an output is an error.
+    if isinstance(obj, int):
+        if writable:
+            raise TypeError('Output must be a buffer')
+        scalar = ctypes.c_int64(obj)
+        return Buffer(ctypes.addressof(scalar), 0, None, scalar)
+
+    view = memoryview(obj)
+    if view.ndim != 1 or view.itemsize != 8 or view.format not in INT64_FORMATS:
+        raise TypeError('Expected a 1-d int64 buffer, got format {0!r} with {1} dimensions'.format(
+            view.format, view.ndim))
+    if writable and view.readonly:
+        raise TypeError('Output buffer is read-only')
+    stride = view.strides[0] // view.itemsize
+
+    interface = getattr(obj, '__array_interface__', None)
+    if interface is not None:
+        return Buffer(interface['data'][0], stride, len(view), obj)
+    if not view.readonly and view.c_contiguous:
+        data = (ctypes.c_int64 * len(view)).from_buffer(view)
+        return Buffer(ctypes.addressof(data), 1, len(view), data)
+    if writable:
+        raise ValueError('Output buffer must be contiguous')
+    data = (ctypes.c_int64 * len(view)).from_buffer_copy(view.tobytes())
+    return Buffer(ctypes.addressof(data), 1, len(view), data)
+
+
+def new_array(length):
+    if numpy is not None:
+        return numpy.empty(length, dtype=numpy.int64)
+    return array.array('q', bytes(8 * length))
+
+
+class Function(object):
+    # A compiled function, called on int64s directly or on whole arrays through its batch wrapper
+    def __init__(self, engine, name, arg_count):
+        self.name = name
+        self.arg_count = arg_count
+        call_ty = ctypes.CFUNCTYPE(ctypes.c_int64, *[ctypes.c_int64] * arg_count)
+        self._call = call_ty(engine.get_function_address(name))
+        batch_ty = ctypes.CFUNCTYPE(None, ctypes.c_int64, ctypes.c_void_p,
+                                    *[ctypes.c_void_p, ctypes.c_int64] * arg_count)
+        self._batch = batch_ty(engine.get_function_address(BATCH_PREFIX + name))
+
+    def _check_args(self, args):
+        if len(args) != self.arg_count:
+            raise TypeError('{0}() takes {1} arguments, got {2}'.format(self.name, self.arg_count, len(args)))
+
+    def __call__(self, *args):
+        self._check_args(args)
+        return self._call(*args)
+
+    def batch(self, *args, out=None):
+        # Arguments are int64 buffers of one length, e.g. numpy arrays, or ints used for every element; the results
+        # go to out, a new array if not given. The loop runs natively and without the GIL.
+        self._check_args(args)
+        buffers = [int64_buffer(arg) for arg in args]
+        lengths = set(buffer.length for buffer in buffers if buffer.length is not None)
+        if out is None:
+            if not lengths:
+                raise TypeError('{0}.batch() needs an array argument or out'.format(self.name))
+            out = new_array(min(lengths))
+        out_buffer = int64_buffer(out, writable=True)
+        lengths.add(out_buffer.length)
+        if len(lengths) != 1:
+            raise ValueError('{0}.batch() got buffers of different lengths {1}'.format(self.name, sorted(lengths)))
+        if out_buffer.stride != 1:
+            raise ValueError('Output buffer must be contiguous')
+
+        flat_args = []
+        for buffer in buffers:
+            flat_args.extend((buffer.address, buffer.stride))
+        self._batch(out_buffer.length, out_buffer.address, *flat_args)
+        return out
+
+
+class Library(object):
+    # Compiles .gg source once for use from Python; main is optional and every function is available by name:
+    #   lib = Library(source)
+    #   lib.f(1, 2)
+    #   lib.f.batch(numpy_array, 2)
+    def __init__(self, source, opt='2', fold=True, stats=None, **options):
+        # Reported like a compilation of the driver, to the hooks of compiler/stats.py and as self.report; stats
+        # are recorded when a hook is registered or a Stats is passed
+        if stats is None:
+            stats = Stats() if HOOKS else NO_STATS
+        opt_level, size_level = OPT_LEVELS[opt]
+        self.cg = CodeGen(opt_level, size_level, stats=stats, **options)
+        program = parse_program([source], fold, stats)
+
+        with stats.phase('generate'):
+            generator = create_generator(self.cg)
+            for func in program.functions:
+                generator.visit_FunctionPrototype(func.prototype)
+            for func in program.functions:
+                generator.generate(func)
+            batch_generator = IRGenerator(self.cg)
+            for func in program.functions:
+                batch_generator.generate_batch(BATCH_PREFIX + func.prototype.name, func.prototype.name)
+        self.cg.add_module(str(self.cg.module))
+        self.cg.collect_pass_timings()
+        self.report = stats.finish() if stats.enabled else None
+
+        self.functions = dict((func.prototype.name, Function(self.cg.engine, func.prototype.name,
+                                                             len(func.prototype.arg_names)))
+                              for func in program.functions)
+
+    def __getitem__(self, name):
+        return self.functions[name]
+
+    def __getattr__(self, name):
+        functions = self.__dict__.get('functions', {})
+        if name not in functions:
+            raise AttributeError(name)
+        return functions[name]
@@ -1,2 +1,10 @@
 class CodeGenError(Exception):
     pass
+
+
+class SemanticError(Exception):
+    pass
+
+
+class ExecutionError(Exception):
+    pass
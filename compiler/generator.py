@@ -0,0 +1,450 @@
+from llvmlite import ir
+
+from compiler.ast import BINARY_OPERATORS, UNARY_OPERATORS, BinaryOp, ForLoop, Input, Variable, Visitor
+from compiler.errors import CodeGenError
+from compiler.profile import ProfileInstrumentation, set_branch_weights, set_entry_count
+from compiler.runtime import FLUSH_FUNCTION, PRINT_FUNCTION, READ_FUNCTION
+
+INT64_ZERO = ir.Constant(ir.IntType(64), 0)
+INT64_ONE = ir.Constant(ir.IntType(64), 1)
+
+
+def _icmp(op):
+    return lambda builder, left, right: builder.icmp_signed(op, left, right)
+
+
+def _not(builder, value):
+    return builder.select(builder.icmp_signed('==', value, INT64_ZERO), INT64_ONE, INT64_ZERO)
+
+
+# Indexed by the opcodes assigned by compiler/semantic.py
+ASSIGN = BINARY_OPERATORS.index('EQUAL_SIGN')
+BINARY_INSTRUCTIONS = [{
+    'SUM': ir.IRBuilder.add,
+    'SUB': ir.IRBuilder.sub,
+    'MUL': ir.IRBuilder.mul,
+    'DIV': ir.IRBuilder.sdiv,
+    'LESS': _icmp('<'),
+    'LESS_EQ': _icmp('<='),
+    'GREATER': _icmp('>'),
+    'GREATER_EQ': _icmp('>='),
+    'EQUALS': _icmp('=='),
+    'NOT_EQUALS': _icmp('!='),
+}.get(op) for op in BINARY_OPERATORS]
+UNARY_INSTRUCTIONS = [{
+    'NOT': _not,
+    'SUB': ir.IRBuilder.neg,
+    'COMPLEMENT': ir.IRBuilder.not_,
+}[op] for op in UNARY_OPERATORS]
+
+
+class IRGenerator(Visitor):
+    # Lowers a resolved AST (see compiler/semantic.py) into the current module of a CodeGen
+    def __init__(self, cg):
+        self.cg = cg
+        self.slots = []
+        # Set for the whole program by visit_Program, see compiler/profile.py
+        self.instrumentation = None
+        self.profile_counts = {}
+
+    @property
+    def builder(self):
+        return self.cg.builder
+
+    @property
+    def module(self):
+        return self.cg.module
+
+    def generate(self, node):
+        return self.visit(node)
+
+    def visit_Program(self, node):
+        # Every function is declared before any body is generated, so functions can call each other in any order
+        if not any(func.prototype.name == 'main' for func in node.functions):
+            raise CodeGenError('No main function')
+        for func in node.functions:
+            self.visit_FunctionPrototype(func.prototype)
+        if self.cg.profile_generate is not None:
+            self.instrumentation = ProfileInstrumentation(self.module, node, self.cg.profile_generate)
+        if self.cg.profile is not None:
+            self.profile_counts = self.cg.profile.annotate(node)
+        for func in node.functions:
+            yield func
+        if self.instrumentation is not None:
+            self.instrumentation.define_dump()
+        return self.module.get_global('main')
+
+    def visit_FunctionPrototype(self, node):
+        func_name = node.name
+        func_ty = ir.FunctionType(self.cg.int64, [self.cg.int64] * len(node.arg_names), False)
+        if func_name in self.module.globals:
+            func = self.module.get_global(func_name)
+            if not isinstance(func, ir.Function):
+                raise CodeGenError('Function / Global name collision', func_name)
+            if not func.is_declaration:
+                raise CodeGenError('Redefinition of {0}', func_name)
+            if len(func.function_type.args) != len(node.arg_names):
+                raise CodeGenError('Redefinition with different number of arguments')
+        else:
+            func = ir.Function(self.module, func_ty, func_name)
+
+        return func
+
+    def visit_Function(self, node):
+        func = self.visit_FunctionPrototype(node.prototype)
+        block = func.append_basic_block('entry')
+        self.builder.position_at_end(block)
+
+        for i, arg in enumerate(func.args):
+            arg.name = node.prototype.arg_names[i]
+        self.create_slots(node, func)
+        self.count_edge(node)
+        if node in self.profile_counts:
+            set_entry_count(self.module, func, self.profile_counts[node][0],
+                            node.prototype.name in self.cg.profile.hot)
+
+        for stmt in node.body:
+            yield stmt
+
+        result = yield node.return_value
+        if self.cg.runtime is not None and node.prototype.name == 'main':
+            # The buffered runtime lives next to main and is flushed when main returns
+            self.call_function(FLUSH_FUNCTION, [])
+            self.cg.runtime.define(self.module)
+        if self.instrumentation is not None and node.prototype.name == 'main':
+            self.builder.call(self.instrumentation.dump, [])
+        self.builder.ret(result)
+        return func
+
+    def generate_loop(self, name, node, slot_names):
+        # A function that resumes a for loop at its condition, on the variables of a frame array that it reads
+        # and writes in place; the interpreter hands hot loops over this way (see compiler/interpreter.py)
+        func_ty = ir.FunctionType(self.cg.int64, [self.cg.int64.as_pointer()])
+        func = ir.Function(self.module, func_ty, name)
+        frame = func.args[0]
+        frame.name = 'frame'
+        frame.add_attribute('noalias')
+        self.builder.position_at_end(func.append_basic_block('entry'))
+        self.slots = [self.builder.gep(frame, [ir.Constant(self.cg.int64, i)], name=slot_name)
+                      for i, slot_name in enumerate(slot_names)]
+
+        # Starting from the counter's current value continues where the interpreter stopped
+        start = Variable(node.var_name)
+        start.slot = node.slot
+        resumed = ForLoop(node.var_name, start, node.end_cond, node.step, node.body)
+        resumed.slot = node.slot
+        self.visit(resumed)
+        self.builder.ret(INT64_ZERO)
+        return func
+
+    def generate_batch(self, name, callee_name):
+        # void name(i64 n, i64* out, i64* arg0, i64 stride0, ...) stores callee(arg0[i * stride0], ...) to out[i]
+        # for every i below n, so embedders call a function on whole arrays at once (see compiler/embed.py)
+        callee = self.module.get_global(callee_name)
+        int64_ptr = self.cg.int64.as_pointer()
+        params = [self.cg.int64, int64_ptr] + [int64_ptr, self.cg.int64] * len(callee.args)
+        func = ir.Function(self.module, ir.FunctionType(ir.VoidType(), params), name)
+        count, out = func.args[:2]
+        args = list(zip(func.args[2::2], func.args[3::2]))
+        self.builder.position_at_end(func.append_basic_block('entry'))
+
+        # Unit strides get a loop of their own, which LLVM can vectorize once the callee is inlined
+        unit = ir.Constant(ir.IntType(1), 1)
+        for _, stride in args:
+            unit = self.builder.and_(unit, self.builder.icmp_signed('==', stride, INT64_ONE))
+        contiguous_block = func.append_basic_block('contiguous')
+        strided_block = func.append_basic_block('strided')
+        exit_block = ir.Block(func, 'exit')
+        self.builder.cbranch(unit, contiguous_block, strided_block)
+        self._batch_loop(contiguous_block, exit_block, callee, count, out, [(ptr, INT64_ONE) for ptr, _ in args])
+        self._batch_loop(strided_block, exit_block, callee, count, out, args)
+
+        func.basic_blocks.append(exit_block)
+        self.builder.position_at_start(exit_block)
+        self.builder.ret_void()
+        return func
+
+    def _batch_loop(self, block, exit_block, callee, count, out, args):
+        func = self.builder.function
+        header_block = func.append_basic_block('batch_header')
+        body_block = func.append_basic_block('batch_body')
+        self.builder.position_at_end(block)
+        self.builder.branch(header_block)
+
+        self.builder.position_at_start(header_block)
+        index = self.builder.phi(self.cg.int64, 'i')
+        index.add_incoming(INT64_ZERO, block)
+        self.builder.cbranch(self.builder.icmp_signed('<', index, count), body_block, exit_block)
+
+        self.builder.position_at_start(body_block)
+        values = [self.builder.load(self.builder.gep(ptr, [self.builder.mul(index, stride)])) for ptr, stride in args]
+        self.builder.store(self.builder.call(callee, values), self.builder.gep(out, [index]))
+        next_index = self.builder.add(index, INT64_ONE)
+        index.add_incoming(next_index, body_block)
+        self.builder.branch(header_block)
+
+    def create_slots(self, node, func):
+        # Every argument and loop counter lives in its own stack slot
+        self.slots = [self.builder.alloca(self.cg.int64, name=name) for name in node.slot_names]
+        for i, arg in enumerate(func.args):
+            self.builder.store(arg, self.slots[i])
+
+    def read_slot(self, slot, name):
+        return self.builder.load(self.slots[slot], name)
+
+    def write_slot(self, slot, value):
+        self.builder.store(value, self.slots[slot])
+
+    # Hooks where control flow splits and merges, stack slots need nothing there (see SSAGenerator)
+    def save_values(self):
+        return None
+
+    def restore_values(self, values):
+        pass
+
+    def merge_values(self, incoming):
+        pass
+
+    def enter_loop(self, node, preheader):
+        return None
+
+    def close_loop(self, loop_values, latch):
+        pass
+
+    def count_edge(self, node, edge=0):
+        # Counts entries of a function, or of the edge of an if or loop, in an instrumented build
+        if self.instrumentation is not None:
+            self.instrumentation.increment(self.builder, node, edge)
+
+    def weigh_branch(self, branch, node):
+        # Branch weights of a conditional branch with the counts of its two edges from the profile
+        if node in self.profile_counts:
+            set_branch_weights(self.module, branch, self.profile_counts[node])
+
+    def call_function(self, name, call_args):
+        callee_func = self.module.globals.get(name, None)
+        if not callee_func or not isinstance(callee_func, ir.Function):
+            raise CodeGenError('Call to unknown function', name)
+        if not callee_func.function_type.var_arg and len(callee_func.args) != len(call_args):
+            raise CodeGenError('Incorrect number of arguments', name)
+        return self.builder.call(callee_func, call_args)
+
+    def tail_call(self, name, call_args):
+        # Returns the result of the call right away; a callee with the caller's signature is guaranteed to reuse
+        # its stack frame, even without optimization
+        func = self.builder.function
+        callee_func = self.module.get_global(name)
+        same_type = callee_func.function_type == func.function_type
+        call = self.call_function(name, call_args)
+        call.tail = 'musttail' if same_type else 'tail'
+        self.builder.ret(call)
+        # Whatever the AST has after the call is unreachable
+        self.builder.position_at_start(func.append_basic_block('after_tail_call'))
+        return call
+
+    def visit_FunctionCall(self, node):
+        call_args = []
+        for arg in node.args:
+            call_args.append((yield arg))
+        if node.tail:
+            return self.tail_call(node.name, call_args)
+        return self.call_function(node.name, call_args)
+
+    def visit_Print(self, node):
+        if self.cg.runtime is not None:
+            value = yield node.value
+            return self.call_function(PRINT_FUNCTION, [value])
+        global_fmt = self.module.globals.get('println_number')
+        fmt_arg = self.builder.bitcast(global_fmt, self.cg.voidptr)
+        value = yield node.value
+        return self.call_function(node.name, [fmt_arg, value])
+
+    # TODO: Add message before input.
+    def visit_Input(self, node):
+        if self.cg.runtime is not None:
+            return self.call_function(READ_FUNCTION, [self.slots[node.slot]])
+        global_fmt = self.module.globals.get('input_number')
+        fmt_arg = self.builder.bitcast(global_fmt, self.cg.voidptr)
+        return self.call_function(node.name, [fmt_arg, self.slots[node.slot]])
+
+    def visit_IfStatement(self, node):
+        cond_val = yield node.condition
+        values = self.save_values()
+
+        then_block = self.builder.function.append_basic_block('then')
+        else_block = ir.Block(self.builder.function, 'else')
+        merge_block = ir.Block(self.builder.function, 'after_if')
+        self.weigh_branch(self.builder.cbranch(cond_val, then_block, else_block), node)
+        self.builder.position_at_start(then_block)
+        self.count_edge(node, 0)
+        then_val = ir.Constant(self.cg.int64, 0)
+        for stmt in node.then_body:
+            then_val = yield stmt
+        # Nested control flow moves the builder, the phi needs the block that actually branches to the merge
+        then_end = self.builder.block
+        then_values = self.save_values()
+        self.builder.branch(merge_block)
+
+        self.restore_values(values)
+        self.builder.function.basic_blocks.append(else_block)
+        self.builder.position_at_start(else_block)
+        self.count_edge(node, 1)
+        else_val = ir.Constant(self.cg.int64, 0)
+        for stmt in node.else_body:
+            else_val = yield stmt
+        else_end = self.builder.block
+        else_values = self.save_values()
+        self.builder.branch(merge_block)
+
+        self.builder.function.basic_blocks.append(merge_block)
+        self.builder.position_at_start(merge_block)
+        phi = self.builder.phi(self.cg.int64, 'if_phi')
+        phi.add_incoming(then_val, then_end)
+        phi.add_incoming(else_val, else_end)
+        self.merge_values([(then_values, then_end), (else_values, else_end)])
+        return phi
+
+    def visit_ForLoop(self, node):
+        # preheader -> header -> body -> latch -> header ... -> exit: the condition is checked before every
+        # iteration, including the first, which gives LLVM a canonical loop to unroll, vectorize or fold away
+        func = self.builder.function
+        start_val = yield node.start
+        self.write_slot(node.slot, start_val)
+        preheader_end = self.builder.block
+        header_block = func.append_basic_block('loop_header')
+        body_block = ir.Block(func, 'loop_body')
+        latch_block = ir.Block(func, 'loop_latch')
+        exit_block = ir.Block(func, 'after_loop')
+        self.builder.branch(header_block)
+
+        self.builder.position_at_start(header_block)
+        loop_values = self.enter_loop(node, preheader_end)
+        end_val = yield node.end_cond
+        exit_values = self.save_values()
+        cmp = self.builder.icmp_signed('!=', end_val, ir.Constant(end_val.type, 0), 'loop_cond')
+        self.weigh_branch(self.builder.cbranch(cmp, body_block, exit_block), node)
+
+        func.basic_blocks.append(body_block)
+        self.builder.position_at_start(body_block)
+        self.count_edge(node, 0)
+        for stmt in node.body:
+            yield stmt
+        self.builder.branch(latch_block)
+
+        func.basic_blocks.append(latch_block)
+        self.builder.position_at_start(latch_block)
+        if node.step is None:
+            step_val = ir.Constant(self.cg.int64, 1)
+        else:
+            step_val = yield node.step
+        cur_var = self.read_slot(node.slot, node.var_name)
+        self.write_slot(node.slot, self.builder.add(cur_var, step_val, 'next_value'))
+        self.close_loop(loop_values, self.builder.block)
+        self.builder.branch(header_block)
+
+        self.restore_values(exit_values)
+        func.basic_blocks.append(exit_block)
+        self.builder.position_at_start(exit_block)
+        self.count_edge(node, 1)
+        return ir.Constant(self.cg.int64, 0)
+
+    def visit_Variable(self, node):
+        return self.read_slot(node.slot, node.name)
+
+    def visit_Number(self, node):
+        return ir.Constant(self.cg.int64, int(node.value))
+
+    def visit_UnaryOp(self, node):
+        value = yield node.value
+        return UNARY_INSTRUCTIONS[node.opcode](self.builder, value)
+
+    def visit_BinaryOp(self, node):
+        if node.opcode == ASSIGN:
+            value = yield node.right
+            self.write_slot(node.left.slot, value)
+            return value
+
+        left = yield node.left
+        right = yield node.right
+        return BINARY_INSTRUCTIONS[node.opcode](self.builder, left, right)
+
+
+def assigned_slots(node):
+    # Slots a statement may write, directly or in any statement nested in it
+    slots = set()
+    for child in node.walk():
+        if isinstance(child, BinaryOp) and child.opcode == ASSIGN:
+            slots.add(child.left.slot)
+        elif isinstance(child, (Input, ForLoop)):
+            slots.add(child.slot)
+    return slots
+
+
+class SSAGenerator(IRGenerator):
+    # Builds SSA form directly: the current value of every slot is tracked while generating, with phis where
+    # branches merge and in loop headers, so there are no allocas for mem2reg to clean up
+    def __init__(self, cg):
+        super().__init__(cg)
+        self.values = []
+        self.slot_names = []
+        self.input_slot = None
+
+    def create_slots(self, node, func):
+        self.slot_names = node.slot_names
+        # Loop counters get their value when their loop starts, nothing reads them before
+        self.values = list(func.args) + [INT64_ZERO] * (len(node.slot_names) - len(func.args))
+        # Input is read through a pointer, it gets the only stack slot
+        self.input_slot = None
+        if any(isinstance(child, Input) for child in node.walk()):
+            self.input_slot = self.builder.alloca(self.cg.int64, name='input')
+
+    def read_slot(self, slot, name):
+        return self.values[slot]
+
+    def write_slot(self, slot, value):
+        self.values[slot] = value
+
+    def save_values(self):
+        return list(self.values)
+
+    def restore_values(self, values):
+        self.values = list(values)
+
+    def merge_values(self, incoming):
+        for slot in range(len(self.values)):
+            values = [values[slot] for values, _ in incoming]
+            if all(value is values[0] for value in values):
+                self.values[slot] = values[0]
+                continue
+            phi = self.builder.phi(self.cg.int64, self.slot_names[slot])
+            for value, (_, block) in zip(values, incoming):
+                phi.add_incoming(value, block)
+            self.values[slot] = phi
+
+    def enter_loop(self, node, preheader):
+        # Every slot the loop writes gets a phi of its value on entry and at the end of the previous iteration
+        phis = {}
+        for slot in sorted(assigned_slots(node)):
+            phi = self.builder.phi(self.cg.int64, self.slot_names[slot])
+            phi.add_incoming(self.values[slot], preheader)
+            phis[slot] = self.values[slot] = phi
+        return phis
+
+    def close_loop(self, loop_values, latch):
+        for slot, phi in loop_values.items():
+            phi.add_incoming(self.values[slot], latch)
+
+    def visit_Input(self, node):
+        # A failed read leaves the variable as it was, like scanf leaves its target
+        self.builder.store(self.values[node.slot], self.input_slot)
+        if self.cg.runtime is not None:
+            result = self.call_function(READ_FUNCTION, [self.input_slot])
+        else:
+            fmt_arg = self.builder.bitcast(self.module.globals.get('input_number'), self.cg.voidptr)
+            result = self.call_function(node.name, [fmt_arg, self.input_slot])
+        self.values[node.slot] = self.builder.load(self.input_slot, node.var)
+        return result
+
+
+def create_generator(cg):
+    return SSAGenerator(cg) if cg.direct_ssa else IRGenerator(cg)
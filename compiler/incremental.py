@@ -0,0 +1,44 @@
+from compiler.ast import FunctionCall, callees
+from compiler.split import collect_prototypes, compile_modules, generate_module
+
+
+class IncrementalCompiler(object):
+    # Compiles every function into its own object, reusing the cached object of unchanged functions
+    def __init__(self, cg, object_cache, jobs=1):
+        self.cg = cg
+        self.object_cache = object_cache
+        self.jobs = jobs
+        self.compiled = []
+        self.reused = []
+
+    def function_key(self, func, prototypes):
+        # A caller only depends on the signatures of its callees, so only those go into its key
+        signatures = [(name, len(prototypes[name].arg_names) if name in prototypes else None)
+                      for name in callees(func)]
+        # Whether a call is a tail call also depends on the callee's return value
+        tail_calls = [node.tail for node in func.walk() if type(node) is FunctionCall]
+        return self.object_cache.key('function', repr(func.dump()), repr(signatures), repr(tail_calls),
+                                     *self.cg.target_key())
+
+    def build(self, program):
+        self.compiled = []
+        self.reused = []
+        prototypes = collect_prototypes(program)
+
+        objects = []
+        missing = []
+        for func in program.functions:
+            key = self.function_key(func, prototypes)
+            data = self.object_cache.get(key)
+            if data is None:
+                missing.append((len(objects), key, func))
+                self.compiled.append(func.prototype.name)
+            else:
+                self.reused.append(func.prototype.name)
+            objects.append(data)
+
+        llvm_irs = [generate_module(self.cg, func.prototype.name, [func], prototypes) for _, _, func in missing]
+        for (index, key, _), data in zip(missing, compile_modules(self.cg, llvm_irs, self.jobs)):
+            self.object_cache.put(key, data)
+            objects[index] = data
+        return objects
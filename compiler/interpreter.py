@@ -0,0 +1,210 @@
+import ctypes
+import os
+
+from compiler.ast import BINARY_OPERATORS, UNARY_OPERATORS, FunctionCall, Visitor, callees
+from compiler.errors import CodeGenError, ExecutionError
+from compiler.optimize import COMPARISONS, INT64_MIN, sdiv, wrap
+
+# Calls plus loop iterations after which a function is compiled
+HOT_THRESHOLD = 1000
+
+
+def _divide(a, b):
+    # Both trap in native code, the interpreter stops with an error instead
+    if b == 0:
+        raise ExecutionError('Division by zero')
+    if a == INT64_MIN and b == -1:
+        raise ExecutionError('Division overflow')
+    return sdiv(a, b)
+
+
+# Indexed by the opcodes assigned by compiler/semantic.py, like the instruction tables of compiler/generator.py
+ASSIGN = BINARY_OPERATORS.index('EQUAL_SIGN')
+BINARY_FUNCTIONS = [dict(COMPARISONS, **{
+    'SUM': lambda a, b: wrap(a + b),
+    'SUB': lambda a, b: wrap(a - b),
+    'MUL': lambda a, b: wrap(a * b),
+    'DIV': _divide,
+}).get(op) for op in BINARY_OPERATORS]
+UNARY_FUNCTIONS = [{
+    'NOT': lambda a: 1 if a == 0 else 0,
+    'SUB': lambda a: wrap(-a),
+    'COMPLEMENT': lambda a: wrap(~a),
+}[op] for op in UNARY_OPERATORS]
+
+
+def load_libc():
+    # printf and scanf of the C library, so interpreted and compiled functions share the stdio buffers
+    if os.name == 'nt':
+        return ctypes.cdll.msvcrt
+    return ctypes.CDLL(None)
+
+
+class Interpreter(Visitor):
+    # Runs a resolved AST (see compiler/semantic.py) right away. Calls and loop iterations heat up their function,
+    # and a function that gets hot is compiled together with its callees; later calls go to the machine code.
+    # A loop that gets hot is compiled on its own and takes over the running frame at its next condition check.
+    def __init__(self, program, threshold=HOT_THRESHOLD, **options):
+        self.functions = dict((func.prototype.name, func) for func in program.functions)
+        if len(self.functions) != len(program.functions):
+            raise CodeGenError('Redefinition of a function')
+        if 'main' not in self.functions:
+            raise CodeGenError('No main function')
+        self.prototypes = dict((name, func.prototype) for name, func in self.functions.items())
+        self.threshold = threshold
+        # Keyword arguments of the CodeGen that compiles hot functions
+        self.options = options
+        self.heat = dict.fromkeys(self.functions, 0)
+        self.loop_heat = {}
+        self.native = {}
+        self.native_loops = {}
+        self.promoted = []
+        self.cg = None
+        self.libc = load_libc()
+        self.frame = None
+        self.function = None
+
+    def run(self):
+        # main's result as the exit status the JIT would give
+        return ctypes.c_int(self.visit(FunctionCall('main', []))).value
+
+    def codegen(self):
+        # LLVM is only loaded once something gets hot, short runs never pay for it
+        if self.cg is None:
+            from compiler.codegen import CodeGen
+            self.cg = CodeGen(**self.options)
+        return self.cg
+
+    def uncompiled(self, names):
+        # Native code cannot call back into the interpreter, so every callee not compiled yet comes along
+        result = []
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name not in self.native and name not in result:
+                result.append(name)
+                pending.extend(callees(self.functions[name]))
+        return result
+
+    def compile(self, names, loop=None):
+        from compiler.generator import IRGenerator
+        from compiler.split import generate_module
+
+        cg = self.codegen()
+        generate_module(cg, 'tier{0}'.format(len(self.promoted)), [self.functions[name] for name in names],
+                        self.prototypes)
+        if loop is not None:
+            generator = IRGenerator(cg)
+            for callee in callees(loop):
+                # Functions compiled before are declared; those compiled with the loop are in the module already
+                if callee not in names and callee not in cg.module.globals:
+                    generator.generate(self.prototypes[callee])
+            loop_name = '__gg_loop{0}'.format(len(self.native_loops))
+            generator.generate_loop(loop_name, loop, self.functions[self.function].slot_names)
+        cg.add_module(str(cg.module))
+
+        for name in names:
+            arg_count = len(self.functions[name].prototype.arg_names)
+            func_ty = ctypes.CFUNCTYPE(ctypes.c_int64, *[ctypes.c_int64] * arg_count)
+            self.native[name] = func_ty(cg.engine.get_function_address(name))
+        if loop is not None:
+            func_ty = ctypes.CFUNCTYPE(ctypes.c_int64, ctypes.POINTER(ctypes.c_int64))
+            self.native_loops[loop] = func_ty(cg.engine.get_function_address(loop_name))
+            names = names + [loop_name]
+        self.promoted.append(names)
+
+    def promote(self, name):
+        self.compile(self.uncompiled([name]))
+
+    def resume_loop(self, node):
+        # Runs the rest of the loop natively on a copy of the frame, then carries on with its values
+        if node not in self.native_loops:
+            self.compile(self.uncompiled(callees(node)), node)
+        frame = (ctypes.c_int64 * len(self.frame))(*self.frame)
+        self.native_loops[node](frame)
+        self.frame[:] = frame
+        return 0
+
+    def call(self, name, args):
+        native = self.native.get(name)
+        if native is None:
+            self.heat[name] += 1
+            if self.heat[name] >= self.threshold:
+                self.promote(name)
+                native = self.native[name]
+        if native is not None:
+            return native(*args)
+
+        func = self.functions[name]
+        if len(args) != len(func.prototype.arg_names):
+            raise CodeGenError('Incorrect number of arguments', name)
+        caller = self.frame, self.function
+        self.frame = args + [0] * (len(func.slot_names) - len(args))
+        self.function = name
+        for stmt in func.body:
+            yield stmt
+        result = yield func.return_value
+        self.frame, self.function = caller
+        return result
+
+    def visit_FunctionCall(self, node):
+        args = []
+        for arg in node.args:
+            args.append((yield arg))
+        return (yield from self.call(node.name, args))
+
+    def visit_Print(self, node):
+        value = yield node.value
+        return self.libc.printf(b'%lld\n', ctypes.c_longlong(value))
+
+    def visit_Input(self, node):
+        # scanf leaves the variable alone when nothing was read
+        value = ctypes.c_longlong(self.frame[node.slot])
+        result = self.libc.scanf(b'%lld', ctypes.byref(value))
+        self.frame[node.slot] = value.value
+        return result
+
+    def visit_IfStatement(self, node):
+        condition = yield node.condition
+        value = 0
+        for stmt in node.then_body if condition else node.else_body:
+            value = yield stmt
+        return value
+
+    def visit_ForLoop(self, node):
+        frame = self.frame
+        frame[node.slot] = yield node.start
+        heat = self.loop_heat.get(node, 0)
+        # The switch happens before the condition, which may assign, so nothing is evaluated twice
+        while heat < self.threshold:
+            if not (yield node.end_cond):
+                self.loop_heat[node] = heat
+                return 0
+            heat += 1
+            self.heat[self.function] += 1
+            for stmt in node.body:
+                yield stmt
+            step = 1 if node.step is None else (yield node.step)
+            frame[node.slot] = wrap(frame[node.slot] + step)
+        self.loop_heat[node] = heat
+        return self.resume_loop(node)
+
+    def visit_Variable(self, node):
+        return self.frame[node.slot]
+
+    def visit_Number(self, node):
+        return int(node.value)
+
+    def visit_UnaryOp(self, node):
+        value = yield node.value
+        return UNARY_FUNCTIONS[node.opcode](value)
+
+    def visit_BinaryOp(self, node):
+        if node.opcode == ASSIGN:
+            value = yield node.right
+            self.frame[node.left.slot] = value
+            return value
+
+        left = yield node.left
+        right = yield node.right
+        return BINARY_FUNCTIONS[node.opcode](left, right)
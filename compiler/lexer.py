@@ -1,41 +1,86 @@
-from rply import LexerGenerator
+import re
+
+from rply import LexingError, Token
+from rply.token import SourcePosition
+
+# Identifiers are matched first and then looked up here, so 'printer' stays an IDENTIFIER
+KEYWORDS = {
+    'print': 'PRINT',
+    'input': 'INPUT',
+    'int': 'PRIMITIVE_DATA_TYPE',
+    'return': 'RETURN',
+    'if': 'IF',
+    'else': 'ELSE',
+    'for': 'FOR',
+}
+
+# Two character operators have to come before their one character prefixes
+OPERATORS = [
+    ('EQUALS', '=='),
+    ('NOT_EQUALS', '!='),
+    ('LESS_EQ', '<='),
+    ('GREATER_EQ', '>='),
+    ('EQUAL_SIGN', ':='),
+    ('OPEN_PAREN', '('),
+    ('CLOSE_PAREN', ')'),
+    ('SEMICOLON', ';'),
+    ('SUM', '+'),
+    ('SUB', '-'),
+    ('MUL', '*'),
+    ('DIV', '/'),
+    ('NOT', '!'),
+    ('COMPLEMENT', '~'),
+    ('OPEN_CURLY', '{'),
+    ('CLOSE_CURLY', '}'),
+    ('LESS', '<'),
+    ('GREATER', '>'),
+    ('COMMA', ','),
+]
+
+
+class CombinedLexer(object):
+    def __init__(self, keywords, operators):
+        self.keywords = keywords
+        self.operators = dict((text, name) for name, text in operators)
+        self.regex = re.compile(
+            r'(?P<NUMBER>\d+)|(?P<IDENTIFIER>[a-zA-Z]\w*)|(?P<OPERATOR>{0})|(?P<SPACE>\s+)'.format(
+                '|'.join(re.escape(text) for _, text in operators)))
+
+    def lex(self, s):
+        # Every token is found by a single match of one combined pattern instead of one regex per rule
+        match = self.regex.match
+        keywords = self.keywords
+        operators = self.operators
+        idx = 0
+        end = len(s)
+        lineno = 1
+        line_start = 0
+        while idx < end:
+            m = match(s, idx)
+            if m is None:
+                raise LexingError(None, SourcePosition(idx, lineno, idx - line_start + 1))
+            kind = m.lastgroup
+            next_idx = m.end()
+            if kind == 'SPACE':
+                newlines = s.count('\n', idx, next_idx)
+                if newlines:
+                    lineno += newlines
+                    line_start = s.rfind('\n', idx, next_idx) + 1
+            else:
+                value = m.group()
+                if kind == 'IDENTIFIER':
+                    kind = keywords.get(value, kind)
+                elif kind == 'OPERATOR':
+                    kind = operators[value]
+                yield Token(kind, value, SourcePosition(idx, lineno, idx - line_start + 1))
+            idx = next_idx
 
 
 class Lexer(object):
-    def __init__(self):
-        self.lexer = LexerGenerator()
-
-    def _add_tokens(self):
-        self.lexer.add('PRINT', r'print')
-        self.lexer.add('INPUT', r'input')
-        self.lexer.add('OPEN_PAREN', r'\(')
-        self.lexer.add('CLOSE_PAREN', r'\)')
-        self.lexer.add('SEMICOLON', r';')
-        self.lexer.add('SUM', r'\+')
-        self.lexer.add('SUB', r'\-')
-        self.lexer.add('NUMBER', r'\d+')
-        self.lexer.add('MUL', r'\*')
-        self.lexer.add('DIV', r'/')
-        self.lexer.add('NOT', r'!')
-        self.lexer.add('COMPLEMENT', r'~')
-        self.lexer.add('PRIMITIVE_DATA_TYPE', r'int')
-        self.lexer.add('OPEN_CURLY', r'{')
-        self.lexer.add('CLOSE_CURLY', r'}')
-        self.lexer.add('RETURN', r'return')
-        self.lexer.add('IF', r'if')
-        self.lexer.add('ELSE', r'else')
-        self.lexer.add('EQUALS', r'==')
-        self.lexer.add('NOT_EQUALS', r'!=')
-        self.lexer.add('FOR', r'for')
-        self.lexer.add('LESS_EQ', r'<=')
-        self.lexer.add('GREATER_EQ', r'>=')
-        self.lexer.add('LESS', r'<')
-        self.lexer.add('GREATER', r'>')
-        self.lexer.add('EQUAL_SIGN', r':=')
-        self.lexer.add('COMMA', r',')
-        self.lexer.add('IDENTIFIER', r'[a-zA-Z]\w*')
-        self.lexer.ignore(r'\s+')
+    # Built once per process and shared by every Lexer instance
+    _lexer = None
 
     def get_lexer(self):
-        self._add_tokens()
-        return self.lexer.build()
+        if Lexer._lexer is None:
+            Lexer._lexer = CombinedLexer(KEYWORDS, OPERATORS)
+        return Lexer._lexer
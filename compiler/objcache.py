@@ -0,0 +1,100 @@
+import hashlib
+import os
+import tempfile
+
+from appdirs import AppDirs
+
+
+class ObjectCache(object):
+    # Content addressed store of machine code, bounded in size with least recently used eviction
+    def __init__(self, directory=None, max_size=256 * 1024 * 1024):
+        self.directory = directory or os.path.join(AppDirs('gg').user_cache_dir, 'objects')
+        self.max_size = max_size
+        # Bytes of all entries, scanned on the first put and kept up to date after, so a put does not list the cache
+        self._size = None
+
+    @staticmethod
+    def key(*parts):
+        hasher = hashlib.sha256()
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = str(part).encode('utf-8')
+            hasher.update(hashlib.sha256(part).digest())
+        return hasher.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.o')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+        # The modification time doubles as the last use for eviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory, mode=0o700)
+            if self._size is None:
+                self._size = self._scan()[1]
+            try:
+                # An entry written again, e.g. by another build, replaces its old size
+                self._size -= os.stat(path).st_size
+            except OSError:
+                pass
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except (IOError, OSError):
+            return
+        self._size += len(data)
+        if self._size > self.max_size:
+            self._evict()
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.o'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        return entries, total
+
+    def _evict(self):
+        # Down to three quarters of the limit, so a full cache is not scanned again on the next put; the scan also
+        # picks up what other processes added
+        entries, total = self._scan()
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size * 3 // 4:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith('.o'):
+                os.remove(os.path.join(self.directory, name))
+        self._size = 0
@@ -0,0 +1,159 @@
+from compiler.ast import BinaryOp, FunctionCall, IfStatement, Number, UnaryOp, Variable, Visitor
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+COMPARISONS = {
+    'LESS': lambda a, b: a < b,
+    'LESS_EQ': lambda a, b: a <= b,
+    'GREATER': lambda a, b: a > b,
+    'GREATER_EQ': lambda a, b: a >= b,
+    'EQUALS': lambda a, b: a == b,
+    'NOT_EQUALS': lambda a, b: a != b,
+}
+
+
+def wrap(value):
+    # Two's complement wraparound of the i64 add/sub/mul/neg instructions
+    value &= (1 << 64) - 1
+    return value - (1 << 64) if value > INT64_MAX else value
+
+
+def sdiv(a, b):
+    # Rounds towards zero like LLVM's sdiv
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+def fold_binary(op, a, b):
+    if op == 'SUM':
+        return wrap(a + b)
+    elif op == 'SUB':
+        return wrap(a - b)
+    elif op == 'MUL':
+        return wrap(a * b)
+    elif op == 'DIV':
+        # Division by zero and INT64_MIN / -1 are undefined in the IR, leave them as they are
+        if b == 0 or (a == INT64_MIN and b == -1):
+            return None
+        return sdiv(a, b)
+    return None
+
+
+def fold_unary(op, a):
+    if op == 'NOT':
+        return 1 if a == 0 else 0
+    elif op == 'SUB':
+        return wrap(-a)
+    elif op == 'COMPLEMENT':
+        return wrap(~a)
+    return None
+
+
+def constant_value(node):
+    return int(node.value) if isinstance(node, Number) else None
+
+
+def has_effect(node):
+    # Calls, input and assignments are the only expressions that do something besides computing a value
+    for child in node.walk():
+        if isinstance(child, FunctionCall) or (isinstance(child, BinaryOp) and child.operator == 'EQUAL_SIGN'):
+            return True
+        if not isinstance(child, (Number, Variable, UnaryOp, BinaryOp)):
+            return True
+    return False
+
+
+def constant_condition(condition):
+    if isinstance(condition, BinaryOp) and condition.operator in COMPARISONS:
+        a = constant_value(condition.left)
+        b = constant_value(condition.right)
+        if a is not None and b is not None:
+            return COMPARISONS[condition.operator](a, b)
+    return None
+
+
+def number(node, value):
+    return node if value is None else Number(str(value))
+
+
+class ConstantFolder(Visitor):
+    # Folds constant expressions, prunes ifs with a constant condition and drops statements without effect
+    def fold_program(self, program):
+        self.visit(program)
+        return program
+
+    def fold_body(self, body, keep_last):
+        # The last statement of an if body is the value of the if, keep_last leaves it in place
+        result = []
+        for stmt in body:
+            stmt = yield stmt
+            taken = constant_condition(stmt.condition) if isinstance(stmt, IfStatement) else None
+            if taken is None:
+                result.append(stmt)
+            else:
+                result.extend(stmt.then_body if taken else stmt.else_body)
+        return [stmt for i, stmt in enumerate(result)
+                if has_effect(stmt) or (keep_last and i == len(result) - 1)]
+
+    def visit_Program(self, node):
+        for func in node.functions:
+            yield func
+        return node
+
+    def visit_Function(self, node):
+        node.body = yield from self.fold_body(node.body, False)
+        node.return_value = yield node.return_value
+        return node
+
+    def visit_IfStatement(self, node):
+        node.condition = yield node.condition
+        node.then_body = yield from self.fold_body(node.then_body, True)
+        node.else_body = yield from self.fold_body(node.else_body, True)
+        return node
+
+    def visit_ForLoop(self, node):
+        node.start = yield node.start
+        node.end_cond = yield node.end_cond
+        if node.step is not None:
+            node.step = yield node.step
+        node.body = yield from self.fold_body(node.body, False)
+        return node
+
+    def visit_FunctionCall(self, node):
+        args = []
+        for arg in node.args:
+            args.append((yield arg))
+        node.args = args
+        return node
+
+    def visit_Print(self, node):
+        node.value = yield node.value
+        return node
+
+    def visit_Input(self, node):
+        return node
+
+    def visit_Variable(self, node):
+        return node
+
+    def visit_Number(self, node):
+        return node
+
+    def visit_UnaryOp(self, node):
+        node.value = yield node.value
+        a = constant_value(node.value)
+        if a is not None:
+            return number(node, fold_unary(node.operator, a))
+        return node
+
+    def visit_BinaryOp(self, node):
+        node.right = yield node.right
+        if node.operator == 'EQUAL_SIGN':
+            return node
+        node.left = yield node.left
+        a = constant_value(node.left)
+        b = constant_value(node.right)
+        if a is not None and b is not None:
+            return number(node, fold_binary(node.operator, a, b))
+        return node
@@ -1,15 +1,26 @@
+import glob
+import os
+
+from appdirs import AppDirs
 from rply import ParserGenerator
+from rply.grammar import Grammar
 
 from compiler.ast import Number, Print, Function, FunctionCall, \
     FunctionPrototype, Program, IfStatement, ForLoop, BinaryOp, Variable, UnaryOp, Input
 
 
 class ParserState(object):
-    func_symbols = {}
+    pass
 
 
 class Parser(object):
-    def __init__(self, cg):
+    # rply keys its table cache on a hash of the grammar and precedence, see _prune_table_cache
+    CACHE_ID = 'gg'
+
+    # Built once per process and shared by every Parser instance
+    _parser = None
+
+    def __init__(self):
         self.pg = ParserGenerator([
             'NUMBER', 'PRINT', 'OPEN_PAREN', 'CLOSE_PAREN', 'SEMICOLON', 'SUM', 'SUB', 'MUL', 'DIV', 'NOT',
             'COMPLEMENT', 'OPEN_CURLY', 'CLOSE_CURLY', 'PRIMITIVE_DATA_TYPE', 'RETURN', 'IDENTIFIER',
@@ -21,29 +32,30 @@ class Parser(object):
             ('left', ['SUM', 'SUB']),
             ('left', ['MUL', 'DIV']),
             ('right', ['NOT', 'COMPLEMENT'])
-        ])
-
-        self.cg = cg
+        ], cache_id=self.CACHE_ID)
 
     def parse(self):
 
-        @self.pg.production('program : function')
-        @self.pg.production('program : program function')
+        @self.pg.production('program : functions')
         def program(state, p):
-            functions = []
-            if len(p) > 1:
-                functions.extend(p[0].functions)
-                functions.append(p[1])
-            else:
-                functions.append(p[0])
-            return Program(self.cg, state, functions)
+            return Program(p[0])
+
+        # List productions extend the list of the left-recursive symbol in place, keeping parsing linear
+        @self.pg.production('functions : function')
+        @self.pg.production('functions : functions function')
+        def functions(state, p):
+            if len(p) == 1:
+                return [p[0]]
+            p[0].append(p[1])
+            return p[0]
 
         @self.pg.production('body : statement')
         @self.pg.production('body : body statement')
         def body(state, p):
             if len(p) == 1:
                 return [p[0]]
-            return p[0] + [p[1]]
+            p[0].append(p[1])
+            return p[0]
 
         @self.pg.production("""function :
                                func_proto OPEN_CURLY
@@ -51,43 +63,45 @@ class Parser(object):
                                RETURN statement
                                CLOSE_CURLY""")
         def func(state, p):
-            return Function(self.cg, state, p[0], p[2], p[4])
+            return Function(p[0], p[2], p[4])
 
         @self.pg.production('func_proto : PRIMITIVE_DATA_TYPE IDENTIFIER OPEN_PAREN CLOSE_PAREN')
         @self.pg.production('func_proto : PRIMITIVE_DATA_TYPE IDENTIFIER OPEN_PAREN arg_names CLOSE_PAREN')
         def func_prototype(state, p):
             if len(p) > 4:
-                return FunctionPrototype(self.cg, state, p[1].value, p[3])
-            return FunctionPrototype(self.cg, state, p[1].value, [])
+                return FunctionPrototype(p[1].value, p[3])
+            return FunctionPrototype(p[1].value, [])
 
         @self.pg.production('arg_names : IDENTIFIER')
         @self.pg.production('arg_names : arg_names COMMA IDENTIFIER')
         def arg_names(state, p):
             if len(p) == 1:
                 return [p[0].value]
-            return p[0] + [p[2].value]
+            p[0].append(p[2].value)
+            return p[0]
 
         @self.pg.production('arg_values : expression')
         @self.pg.production('arg_values : arg_values COMMA expression')
         def arg_values(state, p):
             if len(p) == 1:
                 return [p[0]]
-            return p[0] + [p[2]]
+            p[0].append(p[2])
+            return p[0]
 
         @self.pg.production('function_call : IDENTIFIER OPEN_PAREN CLOSE_PAREN')
         @self.pg.production('function_call : IDENTIFIER OPEN_PAREN arg_values CLOSE_PAREN')
         def func_call(state, p):
             if len(p) > 3:
-                return FunctionCall(self.cg, state, p[0].value, p[2])
-            return FunctionCall(self.cg, state, p[0].value, [])
+                return FunctionCall(p[0].value, p[2])
+            return FunctionCall(p[0].value, [])
 
         @self.pg.production('print : PRINT OPEN_PAREN expression CLOSE_PAREN')
         def print_stmt(state, p):
-            return Print(self.cg, state, p[2])
+            return Print(p[2])
 
         @self.pg.production('input : IDENTIFIER EQUAL_SIGN INPUT OPEN_PAREN CLOSE_PAREN')
         def input_stmt(state, p):
-            return Input(self.cg, state, p[0].value)
+            return Input(p[0].value)
 
         @self.pg.production("""if_stmt :
                                IF OPEN_PAREN bool_exp CLOSE_PAREN OPEN_CURLY
@@ -97,14 +111,14 @@ class Parser(object):
             condition = p[2]
             then_body = p[5]
             else_body = p[9]
-            return IfStatement(self.cg, state, condition, then_body, else_body)
+            return IfStatement(condition, then_body, else_body)
 
         @self.pg.production("""for_loop :
                                FOR OPEN_PAREN IDENTIFIER EQUAL_SIGN expression SEMICOLON
                                bool_exp SEMICOLON expression CLOSE_PAREN OPEN_CURLY
                                body CLOSE_CURLY""")
         def for_loop(state, p):
-            return ForLoop(self.cg, state, p[2].value, p[4], p[6], p[8], p[11])
+            return ForLoop(p[2].value, p[4], p[6], p[8], p[11])
 
         @self.pg.production('statement : expression SEMICOLON')
         @self.pg.production('statement : function_call SEMICOLON')
@@ -133,12 +147,12 @@ class Parser(object):
             left = p[0]
             right = p[2]
             operator = p[1].gettokentype()
-            return BinaryOp(self.cg, state, operator, left, right)
+            return BinaryOp(operator, left, right)
 
         @self.pg.production('expression : IDENTIFIER EQUAL_SIGN expression')
         def var_assignment(state, p):
             var = variable(state, p)
-            return BinaryOp(self.cg, state, 'EQUAL_SIGN', var, p[2])
+            return BinaryOp('EQUAL_SIGN', var, p[2])
 
         @self.pg.production('expression : SUB expression')
         @self.pg.production('expression : COMPLEMENT expression')
@@ -146,19 +160,47 @@ class Parser(object):
         def unary_op(state, p):
             operator = p[0].gettokentype()
             value = p[1]
-            return UnaryOp(self.cg, state, operator, value)
+            return UnaryOp(operator, value)
 
         @self.pg.production('expression : NUMBER')
         def number(state, p):
-            return Number(self.cg, state, p[0].value)
+            return Number(p[0].value)
 
         @self.pg.production('expression : IDENTIFIER')
         def variable(state, p):
-            return Variable(self.cg, state, p[0].value)
+            return Variable(p[0].value)
 
         @self.pg.error
         def error_handle(state, token):
             raise ValueError(token)
 
     def get_parser(self):
-        return self.pg.build()
+        if Parser._parser is None:
+            Parser._parser = self.pg.build()
+            self._prune_table_cache()
+        return Parser._parser
+
+    def _grammar_hash(self):
+        g = Grammar(self.pg.tokens)
+        for level, (assoc, terms) in enumerate(self.pg.precedence, 1):
+            for term in terms:
+                g.set_precedence(term, assoc, level)
+        for prod_name, syms, func, precedence in self.pg.productions:
+            g.add_production(prod_name, syms, func, precedence)
+        g.set_start()
+        return self.pg.compute_grammar_hash(g)
+
+    def table_cache_file(self):
+        return os.path.join(AppDirs('rply').user_cache_dir, '{0}-{1}-{2}.json'.format(
+            self.CACHE_ID, ParserGenerator.VERSION, self._grammar_hash()))
+
+    def _prune_table_cache(self):
+        # Tables built from an older grammar are never read again, remove them
+        current = self.table_cache_file()
+        pattern = os.path.join(os.path.dirname(current), '{0}-*.json'.format(self.CACHE_ID))
+        for path in glob.glob(pattern):
+            if path != current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,174 @@
+import hashlib
+
+from llvmlite import ir
+
+from compiler.ast import ForLoop, Function, IfStatement
+from compiler.runtime import libc_function
+
+PROFILE_HEADER = '# gg profile 1'
+DUMP_FUNCTION = '__gg_profile_dump'
+COUNTERS = '__gg_profile_counters'
+# Share of all calls that goes to the functions counted as hot
+HOT_CALLS = 0.9
+MAX_WEIGHT = (1 << 32) - 1
+
+int8 = ir.IntType(8)
+int32 = ir.IntType(32)
+int64 = ir.IntType(64)
+
+
+def counted_nodes(func):
+    # The function, counting its entries, followed by every if (then and else edges) and loop (iterations and
+    # exits) in walk order; this order is the layout of the function's counters
+    return [func] + [node for node in func.walk() if isinstance(node, (IfStatement, ForLoop))]
+
+
+def edge_count(node):
+    return 1 if isinstance(node, Function) else 2
+
+
+def function_hash(func):
+    # Shape of the control flow, a profile of a function whose shape changed is not used
+    shape = []
+    for node in func.walk():
+        if isinstance(node, IfStatement):
+            shape.append('if {0} {1}'.format(len(node.then_body), len(node.else_body)))
+        elif isinstance(node, ForLoop):
+            shape.append('for {0}'.format(len(node.body)))
+    shape.append(func.prototype.name)
+    return hashlib.sha256('\n'.join(shape).encode('utf-8')).hexdigest()[:16]
+
+
+class ProfileInstrumentation(object):
+    # Counters in one global array, written to the profile file by a function that main calls before it returns:
+    # a line per function with its name, hash and counts, see counted_nodes
+    def __init__(self, module, program, path):
+        self.module = module
+        self.path = path
+        self.functions = program.functions
+        self.offsets = {}
+        size = 0
+        for func in program.functions:
+            for node in counted_nodes(func):
+                self.offsets[node] = size
+                size += edge_count(node)
+        counters_ty = ir.ArrayType(int64, size)
+        self.counters = ir.GlobalVariable(module, counters_ty, COUNTERS)
+        self.counters.linkage = 'internal'
+        self.counters.initializer = ir.Constant(counters_ty, None)
+        self.dump = ir.Function(module, ir.FunctionType(ir.VoidType(), []), DUMP_FUNCTION)
+
+    def increment(self, builder, node, edge=0):
+        counter = builder.gep(self.counters, [ir.Constant(int64, 0), ir.Constant(int64, self.offsets[node] + edge)])
+        builder.store(builder.add(builder.load(counter), ir.Constant(int64, 1)), counter)
+
+    def _string(self, name, text):
+        data = bytearray((text + '\0').encode('utf-8'))
+        var = ir.GlobalVariable(self.module, ir.ArrayType(int8, len(data)), name)
+        var.linkage = 'internal'
+        var.global_constant = True
+        var.initializer = ir.Constant(var.type.pointee, data)
+        return var.bitcast(int8.as_pointer())
+
+    def define_dump(self):
+        voidptr = int8.as_pointer()
+        fopen = libc_function(self.module, ir.FunctionType(voidptr, [voidptr, voidptr]), 'fopen')
+        fprintf = libc_function(self.module, ir.FunctionType(int32, [voidptr, voidptr], var_arg=True), 'fprintf')
+        fclose = libc_function(self.module, ir.FunctionType(int32, [voidptr]), 'fclose')
+
+        builder = ir.IRBuilder(self.dump.append_basic_block('entry'))
+        path = self._string('__gg_profile_path', self.path)
+        stream = builder.call(fopen, [path, self._string('__gg_profile_mode', 'w')])
+        opened = builder.icmp_unsigned('!=', stream, ir.Constant(voidptr, None))
+        with builder.if_then(opened):
+            builder.call(fprintf, [stream, self._string('__gg_profile_header', PROFILE_HEADER + '\n')])
+            for i, func in enumerate(self.functions):
+                nodes = counted_nodes(func)
+                size = sum(edge_count(node) for node in nodes)
+                line = '{0} {1}{2}\n'.format(func.prototype.name, function_hash(func), ' %lld' * size)
+                start = self.offsets[func]
+                counts = [builder.load(builder.gep(self.counters, [ir.Constant(int64, 0), ir.Constant(int64, index)]))
+                          for index in range(start, start + size)]
+                builder.call(fprintf, [stream, self._string('__gg_profile_line{0}'.format(i), line)] + counts)
+            builder.call(fclose, [stream])
+        builder.ret_void()
+
+
+class Profile(object):
+    # Counts of an instrumented run by function name, attached to the IR of a later build as entry counts and
+    # branch weights
+    def __init__(self, functions):
+        self.functions = functions
+        # Functions whose profile did not match their code, and the hot ones, of the last annotate
+        self.stale = []
+        self.hot = set()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()
+        if not lines or lines[0] != PROFILE_HEADER:
+            raise ValueError('{0} is not a gg profile'.format(path))
+        functions = {}
+        for line in lines[1:]:
+            parts = line.split()
+            try:
+                functions[parts[0]] = (parts[1], [int(count) for count in parts[2:]])
+            except (IndexError, ValueError):
+                raise ValueError('Malformed line in profile {0}: {1!r}'.format(path, line))
+        return cls(functions)
+
+    def key(self):
+        # Part of the object cache key, the code depends on the counts
+        return hashlib.sha256(repr(sorted(self.functions.items())).encode('utf-8')).hexdigest()
+
+    def annotate(self, program):
+        # Counts by node for the functions of the program that have a matching profile. No ProfileSummary is
+        # emitted: with this few counters its cold threshold ends up at the hottest loop's count, and LLVM then
+        # optimizes that loop for size. Hot and cold functions are marked with attributes the inliner knows instead.
+        result = {}
+        self.stale = []
+        for func in program.functions:
+            entry = self.functions.get(func.prototype.name)
+            nodes = counted_nodes(func)
+            if entry is None or entry[0] != function_hash(func) or \
+                    len(entry[1]) != sum(edge_count(node) for node in nodes):
+                self.stale.append(func.prototype.name)
+                continue
+            counts = iter(entry[1])
+            for node in nodes:
+                result[node] = [next(counts) for _ in range(edge_count(node))]
+        self.hot = hot_functions(dict((func.prototype.name, result[func][0]) for func in program.functions
+                                      if func in result))
+        return result
+
+
+def hot_functions(entry_counts):
+    # The most called functions that together account for HOT_CALLS of all calls
+    total = sum(entry_counts.values())
+    hot = set()
+    covered = 0
+    for name, count in sorted(entry_counts.items(), key=lambda item: -item[1]):
+        if count == 0 or covered >= HOT_CALLS * total:
+            break
+        hot.add(name)
+        covered += count
+    return hot
+
+
+def set_entry_count(module, func, count, hot):
+    func.set_metadata('prof', module.add_metadata([ir.MetaDataString(module, 'function_entry_count'),
+                                                   ir.Constant(int64, count)]))
+    if count == 0:
+        func.attributes.add('cold')
+    elif hot:
+        func.attributes.add('inlinehint')
+
+
+def set_branch_weights(module, branch, counts):
+    if not any(counts):
+        return
+    # Weights are 32 bit, only their ratio matters
+    scale = max(counts) // MAX_WEIGHT + 1
+    branch.set_metadata('prof', module.add_metadata([ir.MetaDataString(module, 'branch_weights')] +
+                                                    [ir.Constant(int32, count // scale) for count in counts]))
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+
+from compiler.ast import FunctionCall, FunctionPrototype
+from compiler.codegen import CodeGen
+from compiler.driver import parse_program, parse_sources, read_source
+from compiler.errors import CodeGenError, SemanticError
+from compiler.optimize import constant_value
+from compiler.split import generate_module
+
+MANIFEST = 'manifest.json'
+
+
+def scan_source(source, fold=True):
+    # What other files see of a file: name, argument count and constant return value of every function it
+    # defines, and the functions it calls but does not define with their argument counts
+    program = parse_sources([source], fold)
+    interface = [[func.prototype.name, len(func.prototype.arg_names), constant_value(func.return_value)]
+                 for func in program.functions]
+    defined = set(name for name, _, _ in interface)
+    calls = set((node.name, len(node.args)) for func in program.functions for node in func.walk()
+                if type(node) is FunctionCall and node.name not in defined)
+    return interface, [list(call) for call in sorted(calls)]
+
+
+def compile_source(cg, name, source, externals, fold=True):
+    # One file into one object; externals are the interface entries of the functions it calls in other files,
+    # which are declared in its module and resolved when the objects are linked
+    defined = dict((callee, value) for callee, _, value in externals)
+    program = parse_program([source], fold, defined=defined)
+    prototypes = dict((callee, FunctionPrototype(callee, ['arg{0}'.format(i) for i in range(arg_count)]))
+                      for callee, arg_count, _ in externals)
+    prototypes.update((func.prototype.name, func.prototype) for func in program.functions)
+    return cg.compile_object(generate_module(cg, name, program.functions, prototypes))
+
+
+_worker_cg = None
+_worker_fold = True
+
+
+def _init_worker(options, fold):
+    global _worker_cg, _worker_fold
+    _worker_cg = CodeGen(**options)
+    _worker_fold = fold
+
+
+def _scan_file(path):
+    return scan_source(read_source(path), _worker_fold)
+
+
+def _compile_file(job):
+    path, externals = job
+    return compile_source(_worker_cg, path, read_source(path), externals, _worker_fold)
+
+
+class ProjectCompiler(object):
+    # Compiles every file of a multi-file program into its own object, in a pool of worker processes. A manifest
+    # remembers the size, modification time, hash and interface of every file, so unchanged files are not even
+    # read. The calls between files are the dependency graph: the object of a file is keyed by its contents and the
+    # interfaces of the functions it calls in other files, so a file is rebuilt when it changed or when a file it
+    # depends on changed what it exports, and not when only the bodies behind that interface changed.
+    def __init__(self, cg, object_cache, jobs=None, fold=True):
+        self.cg = cg
+        self.object_cache = object_cache
+        self.jobs = jobs or os.cpu_count() or 1
+        self.fold = fold
+        self.manifest_path = os.path.join(object_cache.directory, MANIFEST)
+        self.pool = None
+        self.compiled = []
+        self.reused = []
+        self.scanned = []
+
+    def _map(self, function, items):
+        if self.jobs <= 1 or len(items) <= 1:
+            _init_worker(self.worker_options(), self.fold)
+            return [function(item) for item in items]
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.jobs, _init_worker, (self.worker_options(), self.fold))
+        return self.pool.map(function, items, chunksize=1)
+
+    def worker_options(self):
+        # Workers generate the code too, so they need the generator options besides the pipeline
+        return dict(self.cg.pipeline_options(), direct_ssa=self.cg.direct_ssa, buffered_io=self.cg.runtime is not None)
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        try:
+            if not os.path.isdir(self.object_cache.directory):
+                os.makedirs(self.object_cache.directory, mode=0o700)
+            fd, tmp_path = tempfile.mkstemp(dir=self.object_cache.directory)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+        except (IOError, OSError):
+            pass
+
+    def scan(self, paths):
+        # Entries of the manifest for paths, scanning only files whose contents changed
+        manifest = self.load_manifest()
+        entries = {}
+        pending = []
+        for path in paths:
+            key = os.path.abspath(path)
+            st = os.stat(path)
+            entry = manifest.get(key)
+            if entry is not None and entry['fold'] != self.fold:
+                entry = None
+            if entry is not None and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                entries[path] = entry
+                continue
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if entry is not None and entry['hash'] == digest:
+                entry.update(mtime=st.st_mtime_ns, size=st.st_size)
+                entries[path] = entry
+                continue
+            entries[path] = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'hash': digest, 'fold': self.fold}
+            pending.append(path)
+
+        self.scanned = pending
+        for path, (interface, calls) in zip(pending, self._map(_scan_file, pending)):
+            entries[path].update(interface=interface, calls=calls)
+        manifest.update((os.path.abspath(path), entry) for path, entry in entries.items())
+        self.save_manifest(manifest)
+        return entries
+
+    def link_interfaces(self, entries):
+        # The functions of all files by name, checking that every call has exactly one definition
+        symbols = {}
+        owners = {}
+        for path, entry in entries.items():
+            for item in entry['interface']:
+                if item[0] in symbols:
+                    raise CodeGenError('Redefinition of {0} in {1}, first defined in {2}'.format(
+                        item[0], path, owners[item[0]]))
+                symbols[item[0]] = item
+                owners[item[0]] = path
+        for path, entry in entries.items():
+            for name, arg_count in entry['calls']:
+                if name not in symbols:
+                    raise SemanticError("Call to undefined function '{0}' in {1}".format(name, path))
+                if symbols[name][1] != arg_count:
+                    raise SemanticError("Call to '{0}' in {1} with {2} arguments, {0} in {3} takes {4}".format(
+                        name, path, arg_count, owners[name], symbols[name][1]))
+        return symbols, owners
+
+    def object_key(self, entry, externals):
+        return self.object_cache.key('file', entry['hash'], self.fold, repr(externals), *self.cg.target_key())
+
+    def build(self, paths, needs_main=True):
+        self.compiled = []
+        self.reused = []
+        try:
+            entries = self.scan(paths)
+            symbols, owners = self.link_interfaces(entries)
+            if needs_main and 'main' not in symbols:
+                raise CodeGenError('No main function')
+
+            objects = []
+            missing = []
+            for path in paths:
+                externals = [symbols[name] for name in sorted(set(name for name, _ in entries[path]['calls']))]
+                key = self.object_key(entries[path], externals)
+                data = self.object_cache.get(key)
+                if data is None:
+                    missing.append((len(objects), key, path, externals))
+                    self.compiled.append(path)
+                else:
+                    self.reused.append(path)
+                objects.append(data)
+
+            jobs = [(path, externals) for _, _, path, externals in missing]
+            for (index, key, _, _), data in zip(missing, self._map(_compile_file, jobs)):
+                self.object_cache.put(key, data)
+                objects[index] = data
+            return objects
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
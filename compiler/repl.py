@@ -0,0 +1,159 @@
+import argparse
+import ctypes
+import sys
+import time
+
+from rply import LexingError
+
+from compiler.ast import ForLoop, IfStatement, Input, Print
+from compiler.codegen import CodeGen
+from compiler.driver import OPT_LEVELS, parse_program
+from compiler.errors import CodeGenError, SemanticError
+from compiler.lexer import Lexer
+from compiler.optimize import constant_value
+from compiler.split import generate_module
+
+try:
+    import readline  # noqa: F401, gives input() line editing and history
+except ImportError:
+    pass
+
+# Identifiers start with a letter, so the wrappers cannot use the __gg_ prefix of other generated names
+STATEMENT_PREFIX = 'gg__repl'
+# The body of a function needs a statement before the return
+STATEMENT_WRAPPER = 'int {0}() {{ 0; return {1} }}'
+INPUT_ERRORS = (CodeGenError, SemanticError, ValueError, LexingError, RuntimeError)
+HELP = """Enter function definitions or statements, e.g.
+  int square(x) { x := x * x; return x; }
+  square(12);
+Commands: :functions lists the defined functions, :time toggles timing, :quit exits (or end of input).
+"""
+
+
+class Repl(object):
+    # One CodeGen and JIT engine for the whole session; every input is compiled into a module of its own and added
+    # to the engine, where it links against the functions of earlier inputs, so nothing is ever compiled twice
+    def __init__(self, opt='2', **options):
+        opt_level, size_level = OPT_LEVELS[opt]
+        self.cg = CodeGen(opt_level, size_level, **options)
+        self.lexer = Lexer().get_lexer()
+        self.prototypes = {}
+        # Constant return values of the defined functions, see Resolver.resolve
+        self.returns = {}
+        self.statements = 0
+        self.modules = 0
+        self.libc = ctypes.CDLL(None)
+
+    def is_definition(self, text):
+        for token in self.lexer.lex(text):
+            return token.gettokentype() == 'PRIMITIVE_DATA_TYPE'
+        return False
+
+    def compile(self, text):
+        program = parse_program([text], defined=self.returns)
+        for func in program.functions:
+            name = func.prototype.name
+            if name in self.prototypes:
+                raise CodeGenError('{0} is already defined, the engine cannot replace it'.format(name))
+        prototypes = dict(self.prototypes)
+        prototypes.update((func.prototype.name, func.prototype) for func in program.functions)
+        llvm_ir = generate_module(self.cg, 'repl{0}'.format(self.modules), program.functions, prototypes)
+        self.cg.add_module(llvm_ir)
+        self.modules += 1
+        self.prototypes = prototypes
+        self.returns.update((func.prototype.name, constant_value(func.return_value)) for func in program.functions)
+        return program
+
+    def evaluate(self, text):
+        # Defines the functions of a definition and returns None, or runs a statement and returns its value if it
+        # has one worth showing
+        if self.is_definition(text):
+            self.compile(text)
+            return None
+
+        name = '{0}{1}'.format(STATEMENT_PREFIX, self.statements)
+        program = self.compile(STATEMENT_WRAPPER.format(name, text))
+        self.statements += 1
+        func = ctypes.CFUNCTYPE(ctypes.c_int64)(self.cg.engine.get_function_address(name))
+        sys.stdout.flush()
+        value = func()
+        # Prints go through the C library's buffer, which has to be empty before Python writes again
+        self.libc.fflush(None)
+        if isinstance(program.functions[0].return_value, (Print, IfStatement, ForLoop, Input)):
+            return None
+        return value
+
+    def defined(self):
+        return sorted(name for name in self.prototypes if not name.startswith(STATEMENT_PREFIX))
+
+
+def complete(text):
+    # An input ends at a semicolon or closing brace once all braces and parentheses are closed
+    stripped = text.strip()
+    depth = stripped.count('{') - stripped.count('}') + stripped.count('(') - stripped.count(')')
+    return depth <= 0 and stripped.endswith((';', '}'))
+
+
+def read_input():
+    lines = []
+    while True:
+        line = input('... ' if lines else 'gg> ')
+        if not lines and line.strip().startswith(':'):
+            return line.strip()
+        lines.append(line)
+        text = '\n'.join(lines)
+        if not text.strip():
+            lines = []
+        elif complete(text):
+            return text
+
+
+def run(repl):
+    timing = False
+    while True:
+        try:
+            text = read_input()
+        except EOFError:
+            print()
+            return 0
+        except KeyboardInterrupt:
+            print()
+            continue
+
+        if text in (':quit', ':q'):
+            return 0
+        elif text == ':functions':
+            for name in repl.defined():
+                print('{0}({1})'.format(name, ', '.join(repl.prototypes[name].arg_names)))
+            continue
+        elif text == ':time':
+            timing = not timing
+            continue
+        elif text.startswith(':'):
+            print(HELP, end='')
+            continue
+
+        start = time.perf_counter()
+        try:
+            value = repl.evaluate(text)
+        except INPUT_ERRORS as e:
+            print('error: {0}'.format(e))
+            continue
+        if value is not None:
+            print('= {0}'.format(value))
+        if timing:
+            print('({0:.2f} ms)'.format((time.perf_counter() - start) * 1000))
+
+
+def create_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='gg repl', description='Interactive gg session on a live JIT.')
+    arg_parser.add_argument('-O', dest='opt', choices=sorted(OPT_LEVELS), default='2', help='optimization level')
+    arg_parser.add_argument('--direct-ssa', action='store_true', help='generate SSA form instead of stack slots')
+    return arg_parser
+
+
+def main(argv=None):
+    args = create_arg_parser().parse_args(argv)
+    if sys.stdin.isatty():
+        print('gg repl, :help for help')
+    return run(Repl(args.opt, direct_ssa=args.direct_ssa))
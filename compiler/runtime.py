@@ -0,0 +1,234 @@
+from llvmlite import ir
+
+from compiler.errors import CodeGenError
+
+PRINT_FUNCTION = '__gg_print'
+READ_FUNCTION = '__gg_read'
+FLUSH_FUNCTION = '__gg_flush'
+
+BUFFER_SIZE = 1 << 16
+# The same on Linux, macOS and Windows
+EINTR = 4
+# Longest line __gg_print can produce: sign, 19 digits of INT64_MIN and the newline
+MAX_LINE = 21
+
+int8 = ir.IntType(8)
+int32 = ir.IntType(32)
+int64 = ir.IntType(64)
+buffer_ty = ir.ArrayType(int8, BUFFER_SIZE)
+
+
+def i8(value):
+    return ir.Constant(int8, value)
+
+
+def i32(value):
+    return ir.Constant(int32, value)
+
+
+def i64(value):
+    return ir.Constant(int64, value)
+
+
+def libc_function(module, func_ty, name):
+    # A C library function called by generated code; a gg function of the same name would take its place
+    if name in module.globals:
+        raise CodeGenError('Function / Global name collision', name)
+    return ir.Function(module, func_ty, name)
+
+
+def errno_function(triple):
+    # The C library function returning the address of this thread's errno
+    if 'apple' in triple or 'darwin' in triple:
+        return '__error'
+    if 'windows' in triple or 'msvc' in triple:
+        return '_errno'
+    return '__errno_location'
+
+
+class BufferedRuntime(object):
+    # Integer I/O without stdio: prints are formatted into one large output buffer that is written out when it
+    # fills up, before input is read and when main returns; input is read in bulk and parsed in place
+    def declare(self, module):
+        ir.Function(module, ir.FunctionType(int64, [int64]), PRINT_FUNCTION)
+        ir.Function(module, ir.FunctionType(int64, [int64.as_pointer()]), READ_FUNCTION)
+        ir.Function(module, ir.FunctionType(ir.VoidType(), []), FLUSH_FUNCTION)
+
+    def define(self, module):
+        # Defines the declared functions, in the module that also holds main
+        self.module = module
+        self.write = libc_function(module, ir.FunctionType(int64, [int32, int8.as_pointer(), int64]), 'write')
+        self.read = libc_function(module, ir.FunctionType(int64, [int32, int8.as_pointer(), int64]), 'read')
+        self.out_buf = self._global('__gg_out_buf', buffer_ty, ir.Constant(buffer_ty, None))
+        self.out_len = self._global('__gg_out_len', int64, i64(0))
+        self.in_buf = self._global('__gg_in_buf', buffer_ty, ir.Constant(buffer_ty, None))
+        self.in_pos = self._global('__gg_in_pos', int64, i64(0))
+        self.in_len = self._global('__gg_in_len', int64, i64(0))
+
+        self._define_flush()
+        self._define_print()
+        self._define_getc()
+        self._define_read()
+
+    def _global(self, name, ty, initializer):
+        var = ir.GlobalVariable(self.module, ty, name)
+        var.linkage = 'internal'
+        var.initializer = initializer
+        return var
+
+    def _define_flush(self):
+        # Pipes and sockets take part of the buffer at a time, and signals interrupt write; it is called until
+        # everything is written or it fails for another reason, in which case the rest is dropped like stdio does
+        func = self.module.get_global(FLUSH_FUNCTION)
+        errno_location = ir.Function(self.module, ir.FunctionType(int32.as_pointer(), []),
+                                     errno_function(self.module.triple))
+        builder = ir.IRBuilder(func.append_basic_block('entry'))
+        written = builder.alloca(int64, name='written')
+        builder.store(i64(0), written)
+        length = builder.load(self.out_len)
+        header = func.append_basic_block('write')
+        body = func.append_basic_block('write_more')
+        advance = func.append_basic_block('written')
+        failed = func.append_basic_block('failed')
+        done = func.append_basic_block('done')
+        builder.branch(header)
+
+        builder.position_at_end(header)
+        offset = builder.load(written)
+        builder.cbranch(builder.icmp_signed('<', offset, length), body, done)
+
+        builder.position_at_end(body)
+        buf = builder.gep(self.out_buf, [i64(0), offset])
+        count = builder.call(self.write, [i32(1), buf, builder.sub(length, offset)])
+        builder.cbranch(builder.icmp_signed('>', count, i64(0)), advance, failed)
+
+        builder.position_at_end(advance)
+        builder.store(builder.add(offset, count), written)
+        builder.branch(header)
+
+        builder.position_at_end(failed)
+        interrupted = builder.and_(builder.icmp_signed('<', count, i64(0)),
+                                   builder.icmp_signed('==', builder.load(builder.call(errno_location, [])),
+                                                       i32(EINTR)))
+        builder.cbranch(interrupted, header, done)
+
+        builder.position_at_end(done)
+        builder.store(i64(0), self.out_len)
+        builder.ret_void()
+
+    def _define_print(self):
+        func = self.module.get_global(PRINT_FUNCTION)
+        value = func.args[0]
+        builder = ir.IRBuilder(func.append_basic_block('entry'))
+        digits = builder.alloca(ir.ArrayType(int8, MAX_LINE + 3), name='digits')
+        pos = builder.alloca(int64, name='pos')
+        rest = builder.alloca(int64, name='rest')
+
+        # Digits are written backwards from the newline at the end of the scratch buffer
+        end = MAX_LINE + 2
+        builder.store(i8(ord('\n')), builder.gep(digits, [i64(0), i64(end)]))
+        builder.store(i64(end), pos)
+        negative = builder.icmp_signed('<', value, i64(0))
+        # Unsigned division below also gets INT64_MIN right, whose negation overflows back to itself
+        builder.store(builder.select(negative, builder.neg(value), value), rest)
+
+        loop = func.append_basic_block('digit')
+        after = func.append_basic_block('sign')
+        builder.branch(loop)
+        builder.position_at_end(loop)
+        cur = builder.load(rest)
+        next_pos = builder.sub(builder.load(pos), i64(1))
+        digit = builder.trunc(builder.urem(cur, i64(10)), int8)
+        builder.store(builder.add(digit, i8(ord('0'))), builder.gep(digits, [i64(0), next_pos]))
+        builder.store(next_pos, pos)
+        cur = builder.udiv(cur, i64(10))
+        builder.store(cur, rest)
+        builder.cbranch(builder.icmp_unsigned('!=', cur, i64(0)), loop, after)
+
+        builder.position_at_end(after)
+        with builder.if_then(negative):
+            sign_pos = builder.sub(builder.load(pos), i64(1))
+            builder.store(i8(ord('-')), builder.gep(digits, [i64(0), sign_pos]))
+            builder.store(sign_pos, pos)
+        start = builder.load(pos)
+        count = builder.sub(i64(end + 1), start)
+
+        with builder.if_then(builder.icmp_signed('>', builder.add(builder.load(self.out_len), count),
+                                                 i64(BUFFER_SIZE))):
+            builder.call(self.module.get_global(FLUSH_FUNCTION), [])
+        length = builder.load(self.out_len)
+        memcpy = self.module.declare_intrinsic('llvm.memcpy', [int8.as_pointer(), int8.as_pointer(), int64])
+        builder.call(memcpy, [builder.gep(self.out_buf, [i64(0), length]), builder.gep(digits, [i64(0), start]),
+                              count, ir.Constant(ir.IntType(1), 0)])
+        builder.store(builder.add(length, count), self.out_len)
+        builder.ret(count)
+
+    def _define_getc(self):
+        # Next input byte, or -1 at the end of the input
+        func = ir.Function(self.module, ir.FunctionType(int32, []), '__gg_getc')
+        func.linkage = 'internal'
+        builder = ir.IRBuilder(func.append_basic_block('entry'))
+        with builder.if_then(builder.icmp_signed('>=', builder.load(self.in_pos), builder.load(self.in_len))):
+            # Pending output goes out before blocking on input, so prompts are visible
+            builder.call(self.module.get_global(FLUSH_FUNCTION), [])
+            buf = builder.gep(self.in_buf, [i64(0), i64(0)])
+            count = builder.call(self.read, [i32(0), buf, i64(BUFFER_SIZE)])
+            with builder.if_then(builder.icmp_signed('<=', count, i64(0))):
+                builder.ret(i32(-1))
+            builder.store(count, self.in_len)
+            builder.store(i64(0), self.in_pos)
+        pos = builder.load(self.in_pos)
+        byte = builder.load(builder.gep(self.in_buf, [i64(0), pos]))
+        builder.store(builder.add(pos, i64(1)), self.in_pos)
+        builder.ret(builder.zext(byte, int32))
+        self.getc = func
+
+    def _define_read(self):
+        # Skips whitespace and parses an optionally negative decimal number into its argument.
+        # Returns what scanf would: 1 on success, 0 if no number follows and -1 at the end of the input.
+        func = self.module.get_global(READ_FUNCTION)
+        builder = ir.IRBuilder(func.append_basic_block('entry'))
+        char = builder.alloca(int32, name='char')
+        acc = builder.alloca(int64, name='acc')
+        digits = builder.alloca(int64, name='digits')
+        builder.store(i64(0), acc)
+        builder.store(i64(0), digits)
+
+        skip = func.append_basic_block('skip')
+        sign = func.append_basic_block('sign')
+        digit = func.append_basic_block('digit')
+        done = func.append_basic_block('done')
+        builder.branch(skip)
+
+        builder.position_at_end(skip)
+        c = builder.call(self.getc, [])
+        builder.store(c, char)
+        with builder.if_then(builder.icmp_signed('==', c, i32(-1))):
+            builder.ret(i64(-1))
+        builder.cbranch(builder.icmp_signed('<=', c, i32(ord(' '))), skip, sign)
+
+        builder.position_at_end(sign)
+        negative = builder.icmp_signed('==', c, i32(ord('-')))
+        with builder.if_then(negative):
+            builder.store(builder.call(self.getc, []), char)
+        builder.branch(digit)
+
+        builder.position_at_end(digit)
+        c = builder.load(char)
+        value = builder.sub(c, i32(ord('0')))
+        is_digit = builder.icmp_unsigned('<', value, i32(10))
+        with builder.if_then(is_digit):
+            builder.store(builder.add(builder.mul(builder.load(acc), i64(10)), builder.sext(value, int64)), acc)
+            builder.store(builder.add(builder.load(digits), i64(1)), digits)
+            builder.store(builder.call(self.getc, []), char)
+        builder.cbranch(is_digit, digit, done)
+
+        builder.position_at_end(done)
+        # The byte after the number was consumed, leave it in the buffer unless the input ended
+        with builder.if_then(builder.icmp_signed('!=', builder.load(char), i32(-1))):
+            builder.store(builder.sub(builder.load(self.in_pos), i64(1)), self.in_pos)
+        with builder.if_then(builder.icmp_signed('==', builder.load(digits), i64(0))):
+            builder.ret(i64(0))
+        result = builder.load(acc)
+        builder.store(builder.select(negative, builder.neg(result), result), func.args[0])
+        builder.ret(i64(1))
@@ -0,0 +1,155 @@
+from collections import ChainMap
+
+from compiler.ast import BINARY_OPERATORS, UNARY_OPERATORS, FunctionCall, IfStatement, Variable, Visitor
+from compiler.errors import SemanticError
+from compiler.optimize import constant_value
+
+BINARY_OPCODES = dict((name, opcode) for opcode, name in enumerate(BINARY_OPERATORS))
+UNARY_OPCODES = dict((name, opcode) for opcode, name in enumerate(UNARY_OPERATORS))
+
+
+def tail_statements(body):
+    # Statements after which the function returns without running anything else: the last statement of the
+    # body, or of both branches if that is an if
+    bodies = [body]
+    while bodies:
+        body = bodies.pop()
+        if not body:
+            continue
+        if isinstance(body[-1], IfStatement):
+            bodies.append(body[-1].else_body)
+            bodies.append(body[-1].then_body)
+        else:
+            yield body[-1]
+
+
+def return_calls(node):
+    # Calls whose value is the function's result: the returned statement itself, or the last statement of either
+    # branch of an if that is returned
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        if type(node) is FunctionCall:
+            yield node
+        elif isinstance(node, IfStatement):
+            nodes.extend(body[-1] for body in (node.else_body, node.then_body) if body)
+
+
+class Resolver(Visitor):
+    # Resolves every variable to a slot of its function and every operator to an opcode,
+    # reporting undefined names before any code is generated
+    def __init__(self):
+        self.returns = {}
+        self.function = None
+        self.slot_names = []
+        self.scope = {}
+
+    def resolve(self, program, defined=None):
+        # Runs on the program as written, before constant folding, so a name in code the folder drops is reported
+        # all the same. defined maps functions compiled before, e.g. in a REPL session, to their constant return
+        # value or None. It is looked up rather than copied, a streamed build resolves many small programs against a
+        # large one.
+        self.returns = ChainMap(dict.fromkeys(func.prototype.name for func in program.functions), defined or {})
+        self.visit(program)
+        return program
+
+    def mark_tail_calls(self, program):
+        # After folding, which leaves constant return values and calls at the end of a body to be found
+        self.returns.maps[0].update((func.prototype.name, constant_value(func.return_value))
+                                    for func in program.functions)
+        for func in program.functions:
+            self.mark_function_tail_calls(func)
+        return program
+
+    def lookup(self, name):
+        slot = self.scope.get(name)
+        if slot is None:
+            raise SemanticError("Undefined variable '{0}' in function '{1}'".format(name, self.function))
+        return slot
+
+    def visit_Program(self, node):
+        for func in node.functions:
+            yield func
+
+    def visit_Function(self, node):
+        self.function = node.prototype.name
+        self.slot_names = list(node.prototype.arg_names)
+        self.scope = dict((name, slot) for slot, name in enumerate(self.slot_names))
+        for stmt in node.body:
+            yield stmt
+        yield node.return_value
+        node.slot_names = self.slot_names
+
+    def mark_function_tail_calls(self, node):
+        # A call whose value is returned, `return f(x);` or a call ending a branch of a returned if, is returned
+        # directly instead of growing the stack. So is a call ending the body of a function that returns the
+        # constant the callee also returns. main is left alone, it flushes the runtime before returning.
+        if node.prototype.name == 'main':
+            return
+        for call in return_calls(node.return_value):
+            call.tail = True
+        result = self.returns.get(node.prototype.name)
+        if result is None:
+            return
+        for stmt in tail_statements(node.body):
+            if type(stmt) is FunctionCall and self.returns.get(stmt.name) == result:
+                stmt.tail = True
+
+    def visit_FunctionCall(self, node):
+        if node.name not in self.returns:
+            raise SemanticError("Call to undefined function '{0}' in function '{1}'".format(node.name, self.function))
+        for arg in node.args:
+            yield arg
+
+    def visit_Print(self, node):
+        yield node.value
+
+    def visit_Input(self, node):
+        node.slot = self.lookup(node.var)
+
+    def visit_IfStatement(self, node):
+        yield node.condition
+        for stmt in node.then_body:
+            yield stmt
+        for stmt in node.else_body:
+            yield stmt
+
+    def visit_ForLoop(self, node):
+        # The start value is evaluated before the counter comes into scope
+        yield node.start
+        node.slot = len(self.slot_names)
+        self.slot_names.append(node.var_name)
+
+        # The counter shadows a variable of the same name until the loop ends
+        old_slot = self.scope.get(node.var_name)
+        self.scope[node.var_name] = node.slot
+        for stmt in node.body:
+            yield stmt
+        if node.step is not None:
+            yield node.step
+        yield node.end_cond
+        if old_slot is not None:
+            self.scope[node.var_name] = old_slot
+        else:
+            del self.scope[node.var_name]
+
+    def visit_Variable(self, node):
+        node.slot = self.lookup(node.name)
+
+    def visit_Number(self, node):
+        pass
+
+    def visit_UnaryOp(self, node):
+        node.opcode = UNARY_OPCODES[node.operator]
+        yield node.value
+
+    def visit_BinaryOp(self, node):
+        node.opcode = BINARY_OPCODES[node.operator]
+        if node.operator == 'EQUAL_SIGN':
+            if not isinstance(node.left, Variable):
+                raise SemanticError("Invalid assignment in function '{0}'".format(self.function))
+            node.left.slot = self.lookup(node.left.name)
+            yield node.right
+        else:
+            yield node.left
+            yield node.right
@@ -0,0 +1,114 @@
+import argparse
+import ctypes
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import traceback
+
+from compiler.client import HEADER, connect, default_socket_path
+from compiler.codegen import warm_up
+from compiler.lexer import Lexer
+from compiler.parser import Parser
+
+
+def receive_request(sock):
+    data, fds, _, _ = socket.recv_fds(sock, HEADER.size, 3)
+    if len(data) != HEADER.size or len(fds) != 3:
+        raise ConnectionError('Malformed request')
+    size, = HEADER.unpack(data)
+    payload = b''
+    while len(payload) < size:
+        chunk = sock.recv(size - len(payload))
+        if not chunk:
+            raise ConnectionError('Truncated request')
+        payload += chunk
+    return json.loads(payload.decode('utf-8')), fds
+
+
+class RequestHandler(socketserver.BaseRequestHandler):
+    # Runs in a process forked from the warm server, so it can take over the client's working directory,
+    # environment and standard streams without affecting other requests
+    def handle(self):
+        from compiler.driver import main
+
+        try:
+            request, fds = receive_request(self.request)
+        except (ConnectionError, ValueError):
+            return
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+
+        try:
+            status = main(request['argv'])
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        # The forked process ends with os._exit, which skips flushing Python's and the C library's buffers
+        sys.stdout.flush()
+        sys.stderr.flush()
+        ctypes.CDLL(None).fflush(None)
+        self.request.sendall(json.dumps({'status': status or 0}).encode('utf-8') + b'\n')
+
+
+class Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    # Forks one process per request, so requests run concurrently on top of the state loaded by warm_up
+    block_on_close = False
+
+    def warm_up(self):
+        # The lexer and parser tables are cached on their classes, and warm_up keeps a CodeGen for the default -O2
+        # with its target machines, JIT engine and pass manager ready; every forked request inherits them instead of
+        # building them again, and the first CodeGen of a request with the same target takes them over
+        Lexer().get_lexer()
+        parser = Parser()
+        parser.parse()
+        parser.get_parser()
+        self.codegen = warm_up()
+
+
+def create_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='gg serve',
+                                         description='Compile server for the gg language, see main.py for a client.')
+    arg_parser.add_argument('--socket', default=default_socket_path(), help='path of the Unix socket to listen on')
+    return arg_parser
+
+
+def serve(path):
+    sock = connect(path)
+    if sock is not None:
+        sock.close()
+        raise OSError('A gg server is already listening on {0}'.format(path))
+    if os.path.exists(path):
+        # Left behind by a server that did not shut down cleanly
+        os.unlink(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    old_umask = os.umask(0o077)
+    try:
+        server = Server(path, RequestHandler)
+    finally:
+        os.umask(old_umask)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.warm_up()
+        sys.stderr.write('gg: serving on {0}\n'.format(path))
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(path)
+    return 0
+
+
+def main(argv=None):
+    args = create_arg_parser().parse_args(argv)
+    return serve(args.socket)
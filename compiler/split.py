@@ -0,0 +1,75 @@
+import multiprocessing
+
+from compiler.ast import callees
+from compiler.codegen import CodeGen
+from compiler.errors import CodeGenError
+from compiler.generator import create_generator
+
+
+def collect_prototypes(program):
+    prototypes = {}
+    for func in program.functions:
+        name = func.prototype.name
+        if name in prototypes:
+            raise CodeGenError('Redefinition of {0}'.format(name))
+        prototypes[name] = func.prototype
+    if 'main' not in prototypes:
+        raise CodeGenError('No main function')
+    return prototypes
+
+
+def generate_module(cg, name, functions, prototypes):
+    # Functions of other modules are reached through declarations and resolved when the objects are linked
+    cg.new_module(name)
+    generator = create_generator(cg)
+    for func in functions:
+        for callee in callees(func):
+            if callee in prototypes:
+                generator.generate(prototypes[callee])
+    for func in functions:
+        generator.generate(func)
+    return str(cg.module)
+
+
+_worker_cg = None
+
+
+def _init_worker(options):
+    global _worker_cg
+    _worker_cg = CodeGen(**options)
+
+
+def _compile_module(llvm_ir):
+    return _worker_cg.compile_object(llvm_ir)
+
+
+def compile_modules(cg, llvm_irs, jobs=1):
+    # Optimization and codegen of independent modules, spread over a pool of worker processes
+    if jobs <= 1 or len(llvm_irs) <= 1:
+        return [cg.compile_object(llvm_ir) for llvm_ir in llvm_irs]
+    pool = multiprocessing.Pool(min(jobs, len(llvm_irs)), _init_worker, (cg.pipeline_options(),))
+    try:
+        return pool.map(_compile_module, llvm_irs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class ParallelCompiler(object):
+    # Splits the program into groups of functions, each compiled as its own module
+    def __init__(self, cg, jobs=1, groups_per_job=4):
+        self.cg = cg
+        self.jobs = max(1, jobs)
+        self.groups_per_job = groups_per_job
+
+    def split(self, program):
+        functions = program.functions
+        groups = min(len(functions), self.jobs * self.groups_per_job)
+        size = (len(functions) + groups - 1) // groups
+        return [functions[i:i + size] for i in range(0, len(functions), size)]
+
+    def build(self, program):
+        prototypes = collect_prototypes(program)
+        llvm_irs = [generate_module(self.cg, 'group{0}'.format(i), group, prototypes)
+                    for i, group in enumerate(self.split(program))]
+        return compile_modules(self.cg, llvm_irs, self.jobs)
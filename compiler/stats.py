@@ -0,0 +1,153 @@
+import json
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is left out there
+    resource = None
+
+# Called with the report of every compilation that records statistics, see add_hook
+HOOKS = []
+
+# One row of LLVM's pass timing report: user, system, user+system and wall time, each with a percentage, then the name
+_PASS_ROW = re.compile(r'^\s*(?:[\d.]+ \(\s*[\d.]+%\)\s+)*([\d.]+) \(\s*[\d.]+%\)\s+(\S.*?)(?: #\d+)?\s*$')
+
+
+def add_hook(hook):
+    # Registers hook(report) for the compilations of this process, report being a dict like Stats.report();
+    # returns the hook so it also works as a decorator
+    HOOKS.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    HOOKS.remove(hook)
+
+
+def peak_rss():
+    # Peak resident set size of the process in bytes
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def parse_pass_timings(report):
+    # Wall time per pass from the text LLVM prints, passes that ran several times are added up
+    timings = {}
+    for line in report.splitlines():
+        match = _PASS_ROW.match(line)
+        if match is not None and match.group(2) != 'Total':
+            name = match.group(2)
+            timings[name] = timings.get(name, 0.0) + float(match.group(1))
+    return sorted(timings.items(), key=lambda item: -item[1])
+
+
+class Stats(object):
+    # Wall time per compilation phase and how much it raised the peak memory of the process, counts like AST nodes
+    # and IR instructions, and the time of every LLVM pass. Phases that run several times, e.g. optimize for each
+    # module, are added up.
+    enabled = True
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.counts = {}
+        self.passes = []
+
+    @contextmanager
+    def phase(self, name):
+        # The peak RSS is a high-water mark of the whole process, a phase is charged with what it added to it; a
+        # phase that stays below an earlier peak adds nothing
+        start = time.perf_counter()
+        start_rss = peak_rss()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            phase = self.phases.setdefault(name, {'seconds': 0.0, 'calls': 0, 'peak_rss_growth': None})
+            phase['seconds'] += seconds
+            phase['calls'] += 1
+            if start_rss is not None:
+                phase['peak_rss_growth'] = (phase['peak_rss_growth'] or 0) + peak_rss() - start_rss
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def add_pass_timings(self, report):
+        timings = dict(self.passes)
+        for name, seconds in parse_pass_timings(report):
+            timings[name] = timings.get(name, 0.0) + seconds
+        self.passes = sorted(timings.items(), key=lambda item: -item[1])
+
+    def report(self):
+        return {
+            'total_seconds': time.perf_counter() - self.start,
+            'peak_rss': peak_rss(),
+            'phases': [dict(phase, name=name) for name, phase in self.phases.items()],
+            'counts': dict(self.counts),
+            'passes': [{'name': name, 'seconds': seconds} for name, seconds in self.passes],
+        }
+
+    def finish(self):
+        # The final report, after handing it to the hooks
+        report = self.report()
+        for hook in list(HOOKS):
+            hook(report)
+        return report
+
+
+class NoStats(Stats):
+    # Used when nothing asked for statistics; records nothing and keeps the phases as cheap as possible
+    enabled = False
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def count(self, name, value):
+        pass
+
+    def add_pass_timings(self, report):
+        pass
+
+
+NO_STATS = NoStats()
+
+
+def format_bytes(size):
+    if size is None:
+        return '-'
+    return '{0:.1f} MiB'.format(size / (1024.0 * 1024.0))
+
+
+def format_text(report, max_passes=20):
+    lines = ['gg: time report, {0:.1f} ms total, peak RSS {1}'.format(
+        report['total_seconds'] * 1000, format_bytes(report['peak_rss']))]
+    lines.append('  {0:<16} {1:>10} {2:>6} {3:>14}'.format('phase', 'ms', 'calls', 'peak RSS +'))
+    for phase in report['phases']:
+        lines.append('  {0:<16} {1:>10.2f} {2:>6} {3:>14}'.format(
+            phase['name'], phase['seconds'] * 1000, phase['calls'], format_bytes(phase['peak_rss_growth'])))
+    if report['counts']:
+        lines.append('  {0:<32} {1:>10}'.format('count', 'value'))
+        for name, value in sorted(report['counts'].items()):
+            lines.append('  {0:<32} {1:>10}'.format(name, value))
+    if report['passes']:
+        lines.append('  {0:<56} {1:>10}'.format('LLVM pass', 'ms'))
+        for timing in report['passes'][:max_passes]:
+            lines.append('  {0:<56} {1:>10.2f}'.format(timing['name'][:56], timing['seconds'] * 1000))
+        if len(report['passes']) > max_passes:
+            lines.append('  ... {0} more passes'.format(len(report['passes']) - max_passes))
+    return '\n'.join(lines) + '\n'
+
+
+def format_json(report):
+    return json.dumps(report, indent=2, sort_keys=True) + '\n'
+
+
+FORMATS = {'text': format_text, 'json': format_json}
@@ -0,0 +1,126 @@
+import os
+import re
+import shutil
+import tempfile
+
+from compiler.ast import FunctionPrototype, callees
+from compiler.driver import OBJ_SUFFIX, parse_program, parse_sources
+from compiler.errors import CodeGenError
+from compiler.split import generate_module
+
+# Characters read at a time, and source characters of the functions compiled together in one module
+CHUNK_SIZE = 1 << 20
+BATCH_SIZE = 1 << 18
+
+BRACES = re.compile(r'[{}]')
+HEADER = re.compile(r'\s*int\s+([a-zA-Z]\w*)\s*\(([^)]*)\)\s*\{')
+# A function ending in `return <number>;`, its constant return value for tail calls, see Resolver
+CONSTANT_RETURN = re.compile(r'return\s+(-?\d+)\s*;\s*\}\s*$')
+
+
+def function_texts(f, chunk_size=CHUNK_SIZE):
+    # The top level functions of a source file, read a chunk at a time. There are no strings or comments in the
+    # language, so a function ends at the brace that closes its body; anything else is left to the parser.
+    pending = ''
+    scanned = 0
+    depth = 0
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        start = 0
+        for m in BRACES.finditer(pending, scanned):
+            depth += 1 if m.group() == '{' else -1
+            if depth <= 0:
+                yield pending[start:m.end()]
+                start = m.end()
+                depth = 0
+        pending = pending[start:]
+        scanned = len(pending)
+    if pending.strip():
+        yield pending
+
+
+class StreamCompiler(object):
+    # Compiles a source file of any size with memory that depends on the size of its functions, not of the file.
+    # A first pass over the file only collects the name, argument count and constant return of every function. The
+    # second pass parses the functions a batch at a time, generates and compiles them as a module of their own and
+    # writes its object to disk; the batch's text, AST and IR are dropped before the next one is read.
+    def __init__(self, cg, fold=True, batch_size=BATCH_SIZE, chunk_size=CHUNK_SIZE):
+        self.cg = cg
+        self.fold = fold
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.arg_counts = {}
+        self.returns = {}
+        self.directory = None
+        self.objects = []
+
+    def declare(self, text):
+        m = HEADER.match(text)
+        if m is None:
+            # Not a function, the parser says why
+            parse_sources([text], self.fold)
+            raise CodeGenError('Expected a function: {0!r}'.format(text[:80]))
+        name = m.group(1)
+        if name in self.arg_counts:
+            raise CodeGenError('Redefinition of {0}'.format(name))
+        args = m.group(2).strip()
+        self.arg_counts[name] = len(args.split(',')) if args else 0
+        value = CONSTANT_RETURN.search(text, max(0, len(text) - 64))
+        self.returns[name] = int(value.group(1)) if value else None
+
+    def scan(self, paths, needs_main=True):
+        with self.cg.stats.phase('scan'):
+            for path in paths:
+                with open(path, 'r') as f:
+                    for text in function_texts(f, self.chunk_size):
+                        self.declare(text)
+        if needs_main and 'main' not in self.arg_counts:
+            raise CodeGenError('No main function')
+
+    def batches(self, paths):
+        batch = []
+        size = 0
+        for path in paths:
+            with open(path, 'r') as f:
+                for text in function_texts(f, self.chunk_size):
+                    batch.append(text)
+                    size += len(text)
+                    if size >= self.batch_size:
+                        yield ''.join(batch)
+                        batch = []
+                        size = 0
+        if batch:
+            yield ''.join(batch)
+
+    def compile_batch(self, index, text):
+        program = parse_program([text], self.fold, self.cg.stats, defined=self.returns)
+        prototypes = dict((func.prototype.name, func.prototype) for func in program.functions)
+        for func in program.functions:
+            for callee in callees(func):
+                if callee not in prototypes:
+                    arg_names = ['arg{0}'.format(i) for i in range(self.arg_counts[callee])]
+                    prototypes[callee] = FunctionPrototype(callee, arg_names)
+        with self.cg.stats.phase('generate'):
+            llvm_ir = generate_module(self.cg, 'stream{0}'.format(index), program.functions, prototypes)
+        # Nothing of the batch but its IR is kept while LLVM works on it
+        del program, prototypes
+        path = os.path.join(self.directory, '{0}{1}'.format(index, OBJ_SUFFIX))
+        with open(path, 'wb') as f:
+            f.write(self.cg.compile_object(llvm_ir))
+        return path
+
+    def build(self, paths, needs_main=True):
+        # Object files of the program in a temporary directory, removed by close
+        self.scan(paths, needs_main)
+        self.directory = tempfile.mkdtemp(prefix='gg-stream-')
+        self.objects = [self.compile_batch(index, text) for index, text in enumerate(self.batches(paths))]
+        self.cg.stats.count('modules', len(self.objects))
+        return self.objects
+
+    def close(self):
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
@@ -1,4 +1,3 @@
-llc -filetype=obj output.ll
-gcc output.obj -o output
+python ..\gg ..\example.gg --emit=exe -o output.exe
 output
 echo %ERRORLEVEL%
\ No newline at end of file
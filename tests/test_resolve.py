@@ -0,0 +1,14 @@
+import pytest
+
+from compiler.driver import parse_program
+from compiler.errors import SemanticError
+
+PRUNED_UNDEFINED = 'int main() { if (1 > 2) { print(zz); } else { 0; } return 0; }'
+DROPPED_UNDEFINED = 'int main() { zz; return 0; }'
+
+
+@pytest.mark.parametrize('source', [PRUNED_UNDEFINED, DROPPED_UNDEFINED])
+@pytest.mark.parametrize('fold', [True, False])
+def test_names_in_folded_away_code_are_resolved(source, fold):
+    with pytest.raises(SemanticError, match="Undefined variable 'zz'"):
+        parse_program([source], fold)
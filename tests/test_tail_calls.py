@@ -0,0 +1,64 @@
+import subprocess
+
+from compiler.ast import FunctionCall
+from compiler.driver import EXE_SUFFIX, compile_sources, link_objects, parse_program
+
+RETURN_RECURSION = """
+int down(n, acc) {
+    n;
+    return if (n > 0) {
+        down(n - 1, acc + 1);
+    } else {
+        print(acc);
+        acc;
+    }
+}
+
+int ping(n) {
+    n;
+    return if (n > 0) {
+        pong(n - 1, 0);
+    } else {
+        print(n);
+        n;
+    }
+}
+
+int pong(n, unused) {
+    n;
+    return ping(n);
+}
+
+int main() {
+    down(10000000, 0);
+    ping(10000000);
+    return 0;
+}
+"""
+
+
+def calls(program):
+    return dict((func.prototype.name, [node.tail for node in func.walk() if type(node) is FunctionCall])
+                for func in program.functions)
+
+
+def test_calls_in_return_position_are_tail_calls():
+    tails = calls(parse_program([RETURN_RECURSION]))
+    assert tails['down'] == [True]
+    assert tails['ping'] == [True]
+    assert tails['pong'] == [True]
+    # main flushes the runtime before it returns
+    assert tails['main'] == [False, False]
+
+
+def test_call_before_the_return_is_not_a_tail_call():
+    source = 'int f(n) { n; return n; } int g(n) { f(n); return n; } int main() { g(1); return 0; }'
+    assert calls(parse_program([source]))['g'] == [False]
+
+
+def test_return_recursion_does_not_grow_the_stack_at_O0(tmp_path):
+    exe = str(tmp_path / ('down' + EXE_SUFFIX))
+    link_objects([compile_sources([RETURN_RECURSION], '0').emit('obj')], exe)
+    process = subprocess.run([exe], stdout=subprocess.PIPE, universal_newlines=True)
+    assert process.returncode == 0
+    assert process.stdout.split() == ['10000000', '0']
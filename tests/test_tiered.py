@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# f is only called once the loop is hot, so it is compiled together with the loop
+HOT_LOOP_CALL = """
+int f(x) {
+    print(x);
+    return 0;
+}
+
+int main() {
+    for (i := 0; i < 5000; 1) {
+        if (i > 3000) {
+            f(i);
+        } else {
+            0;
+        }
+    }
+    return 0;
+}
+"""
+
+
+def gg(path, *args):
+    return subprocess.run([sys.executable, '-m', 'compiler.driver', path] + list(args), cwd=ROOT,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+
+def test_hot_loop_compiled_with_its_uncompiled_callee(tmp_path):
+    path = str(tmp_path / 'loop.gg')
+    with open(path, 'w') as f:
+        f.write(HOT_LOOP_CALL)
+    process = gg(path, '--tiered')
+    assert process.stderr == ''
+    assert process.returncode == 0
+    assert process.stdout.split() == [str(i) for i in range(3001, 5000)]
+    assert process.stdout == gg(path, '--run', '--no-cache').stdout